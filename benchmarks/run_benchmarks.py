@@ -0,0 +1,322 @@
+"""
+Benchmarks of the per call overhead of the fuzzing pipeline and of the core fuzzers and filters, measured on synthetic
+workflows of varying size and nesting depth.
+
+Usage:
+
+    python benchmarks/run_benchmarks.py [--sizes 10,100,1000,10000] [--depths 1,10,50] [--output results.json]
+    python benchmarks/run_benchmarks.py --compare baseline.json results.json
+
+Results are written as JSON, one record per benchmark, workflow size and nesting depth, so that results recorded for
+different commits can be compared.
+@author twsswt
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pydysofu as fm
+
+from pydysofu import core_fuzzers
+from pydysofu.fuzz_weaver import compiled_mutants, fuzz_function, get_reference_syntax_tree
+
+FUZZERS = [
+    'identity',
+    'remove_last_step',
+    'remove_random_step',
+    'duplicate_last_step',
+    'shuffle_steps',
+    'swap_if_blocks',
+    'replace_steps_with_pass',
+    'filter_steps(exclude_control_structures(), shuffle_steps)',
+    'recurse_into_nested_steps(shuffle_steps)',
+    'recurse_into_nested_steps(replace_condition_with(False))',
+    'in_sequence([remove_random_step, duplicate_last_step])',
+    'choose_from([(0.5, identity), (0.5, shuffle_steps)])',
+]
+
+FILTERS = [
+    'choose_identity',
+    'choose_random_steps(1)',
+    'choose_last_steps(1)',
+    'choose_last_step',
+    'exclude_control_structures()',
+    'include_control_structures()',
+    'invert(choose_last_step)',
+]
+
+PIPELINE_FUZZER = 'remove_random_step'
+
+# Random stream operations used by fuzzers, each applied to a list of steps.
+RANDOM_OPERATIONS = [
+    ('uniform', lambda stream, steps: stream.uniform(0, 1)),
+    ('sample_1', lambda stream, steps: stream.sample(range(0, len(steps) - 1), 1)),
+    ('sample_3', lambda stream, steps: stream.sample(range(0, len(steps) - 1), 3)),
+    ('shuffle', lambda stream, steps: stream.shuffle(steps)),
+]
+
+
+def _workflow_body(statements, depth, indentation):
+    """
+    :return : the source lines of a workflow body containing the given number of statements, spread evenly over the
+    given number of nested if blocks.  Nesting uses if statements only, as the compiler limits the static nesting of
+    loops to 20 blocks.
+    """
+    per_level = max(1, statements // (depth + 1))
+    lines = list()
+    count = 0
+    for level in range(depth + 1):
+        prefix = ' ' * (indentation + 4 * level)
+        level_statements = per_level if level < depth else max(1, statements - count)
+        for _ in range(level_statements):
+            lines.append('%sself.environment.append(%d)' % (prefix, count))
+            count += 1
+        if level < depth:
+            lines.append(prefix + 'if self.environment is not None:')
+    return lines
+
+
+def synthetic_workflow_module(directory, statements, depth):
+    """
+    Writes and imports a module defining a workflow class with a single workflow method and a module level workflow
+    function of the given size and nesting depth.
+    """
+    name = 'synthetic_workflow_%d_%d' % (statements, depth)
+    lines = [
+        'class SyntheticWorkflow(object):',
+        '',
+        '    def __init__(self, environment):',
+        '        self.environment = environment',
+        '',
+        '    def workflow(self):',
+    ] + _workflow_body(statements, depth, 8) + [
+        '',
+        '',
+        'def workflow(self):',
+    ] + _workflow_body(statements, depth, 4) + ['']
+
+    path = os.path.join(directory, name + '.py')
+    with open(path, 'w') as module_file:
+        module_file.write('\n'.join(lines))
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(func, repeat=3):
+    """
+    :return : the best observed time in seconds of a single call of the function.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def _fuzzer(expression):
+    return eval(expression, dict(vars(core_fuzzers)))
+
+
+class _Sink(object):
+    """
+    A workflow environment that discards the steps appended to it.
+    """
+
+    def append(self, value):
+        pass
+
+
+def benchmarks(module):
+    """
+    :return : a list of (benchmark name, 0-ary setup function or None, 0-ary benchmark function) triples for the workflows of the module.
+    """
+    clazz = module.SyntheticWorkflow
+    pipeline_fuzzer = _fuzzer(PIPELINE_FUZZER)
+    target = clazz(_Sink())
+
+    def unwoven_call():
+        target.workflow()
+
+    def woven_call():
+        target.workflow()
+
+    def woven_setup():
+        fm.fuzz_clazz(clazz, {clazz.workflow: pipeline_fuzzer})
+
+    decorated_workflow = fm.fuzz(pipeline_fuzzer)(module.workflow)
+
+    def decorated_call():
+        decorated_workflow(target)
+
+    def fuzz_function_call():
+        fuzz_function(module.workflow, pipeline_fuzzer)
+
+    def fuzz_function_code_table_call():
+        fuzz_function(module.workflow, pipeline_fuzzer, code_table=compiled_mutants)
+
+    def fuzz_function_copy_on_write_call():
+        fuzz_function(module.workflow, pipeline_fuzzer, copy_on_write=True)
+
+    def fuzz_function_copy_on_write_code_table_call():
+        fuzz_function(module.workflow, pipeline_fuzzer, copy_on_write=True, code_table=compiled_mutants)
+
+    steps = get_reference_syntax_tree(module.workflow).body[0].body
+
+    result = [
+        ('unwoven_call', None, unwoven_call),
+        ('fuzz_function', None, fuzz_function_call),
+        ('fuzz_function_code_table', None, fuzz_function_code_table_call),
+        ('fuzz_function_copy_on_write', None, fuzz_function_copy_on_write_call),
+        ('fuzz_function_copy_on_write_code_table', None, fuzz_function_copy_on_write_code_table_call),
+        ('fuzz_decorator', None, decorated_call),
+        ('fuzz_clazz_woven_call', woven_setup, woven_call),
+    ]
+
+    for expression in FUZZERS:
+        fuzzer = _fuzzer(expression)
+        result.append(('fuzzer:' + expression, None, lambda fuzzer=fuzzer: fuzzer(list(steps), None)))
+
+    for expression in FILTERS:
+        fuzz_filter = _fuzzer(expression)
+        result.append(('filter:' + expression, None, lambda fuzz_filter=fuzz_filter: fuzz_filter(list(steps))))
+
+    return result + random_stream_benchmarks(len(steps))
+
+
+def random_stream_benchmarks(statements):
+    """
+    :return : benchmarks of the random stream operations used by fuzzers, for Random and, if NumPy is installed,
+    BatchedRandom, on a list of the given number of steps.
+    """
+    streams = [('Random', Random(1))]
+    try:
+        streams.append(('BatchedRandom', fm.BatchedRandom(1)))
+    except ImportError:
+        pass
+
+    result = list()
+    for stream_name, stream in streams:
+        for operation_name, operation in RANDOM_OPERATIONS:
+            steps = list(range(max(statements, 4)))
+            result.append((
+                'random:%s.%s' % (stream_name, operation_name), None,
+                lambda stream=stream, operation=operation, steps=steps: operation(stream, steps)))
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, depths, selected=None):
+    results = list()
+    directory = tempfile.mkdtemp()
+    sys.path.insert(0, directory)
+    try:
+        for statements in sizes:
+            for depth in depths:
+                module = synthetic_workflow_module(directory, statements, depth)
+                for name, setup, benchmark in benchmarks(module):
+                    if selected is not None and not any(s in name for s in selected):
+                        continue
+                    record = {'benchmark': name, 'statements': statements, 'depth': depth}
+                    try:
+                        if setup is not None:
+                            setup()
+                        record['seconds_per_call'] = measure(benchmark)
+                    except Exception as e:
+                        record['error'] = '%s: %s' % (type(e).__name__, e)
+                    finally:
+                        fm.defuzz_all_classes()
+                    results.append(record)
+                    sys.stderr.write('%s\n' % json.dumps(record))
+    finally:
+        sys.path.remove(directory)
+        shutil.rmtree(directory)
+
+    return {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(baseline_path, results_path, threshold):
+    """
+    Prints the ratio of the time per call of each benchmark in the results to the baseline.
+    :return : the number of benchmarks that were slower than the baseline by more than the threshold ratio.
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(results_path) as results_file:
+        results = json.load(results_file)
+
+    def key(record):
+        return record['benchmark'], record['statements'], record['depth']
+
+    baseline_times = {key(r): r.get('seconds_per_call') for r in baseline['results']}
+
+    regressions = 0
+    for record in results['results']:
+        before = baseline_times.get(key(record))
+        after = record.get('seconds_per_call')
+        if before is None or after is None:
+            continue
+        ratio = after / before
+        flag = ''
+        if ratio > threshold:
+            flag = ' REGRESSION'
+            regressions += 1
+        print('%-70s %6d %3d %12.3e %12.3e %7.2fx%s' % (key(record) + (before, after, ratio, flag)))
+
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='comma separated workflow statement counts')
+    parser.add_argument('--depths', default='1,10,50', help='comma separated workflow nesting depths')
+    parser.add_argument('--benchmarks', default=None, help='comma separated substrings of benchmark names to run')
+    parser.add_argument('--output', default=None, help='the results file, written to standard output by default')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'RESULTS'), help='compare two results files')
+    parser.add_argument('--threshold', type=float, default=1.1, help='the slowdown ratio reported as a regression')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.compare:
+        return 1 if compare(arguments.compare[0], arguments.compare[1], arguments.threshold) else 0
+
+    sizes = [int(s) for s in arguments.sizes.split(',')]
+    depths = [int(d) for d in arguments.depths.split(',')]
+    selected = None if arguments.benchmarks is None else arguments.benchmarks.split(',')
+
+    results = run(sizes, depths, selected)
+
+    if arguments.output is None:
+        json.dump(results, sys.stdout, indent=2)
+    else:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
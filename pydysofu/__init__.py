@@ -3,6 +3,12 @@ Front end API for the fuzzi_moss library.
 """
 
 from .fuzz_decorator import fuzz
-from .fuzz_weaver import fuzz_clazz, defuzz_class, fuzz_module, defuzz_all_classes
-from .config import pydysofu_random
+from .fuzz_weaver import fuzz_clazz, defuzz_class, fuzz_module, defuzz_all_classes, use_syntax_tree_cache
+from .config import pydysofu_random, current_random, random_stream, CounterRandom, BatchedRandom
+from .mutant_cache import MutantCache
+from .mutant_library import MutantLibrary, enumerate_mutants
+from .campaign import run_campaign
+from .stage_timings import enable_stage_timings, stage_timings, reset_stage_timings
+from .fuzzer_trace import TraceRecorder, set_trace_recorder, trace_recorder
+from .fuzzing_events import subscribe, unsubscribe
 from .core_fuzzers import fuzzer_invocations, fuzzer_invocations_count, reset_invocation_counters, remove_last_step, remove_random_step, duplicate_last_step
@@ -0,0 +1,98 @@
+"""
+Campaigns of repeated, fuzzed trials of a workflow, run in parallel across a pool of worker processes.
+@author twsswt
+"""
+
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import CounterRandom, pydysofu_random, random_stream
+from .fuzz_weaver import fuzz_clazz, get_reference_syntax_tree
+
+# The state of the campaign run by a worker process, established by _initialise_worker.
+_worker_campaign = None
+
+
+def _warm_reference_syntax_trees(fuzzing_advice):
+    for reference_function in fuzzing_advice.keys():
+        get_reference_syntax_tree(reference_function)
+
+
+def _initialise_worker(setup, fuzzing_advice, trial, seed, fuzzing_options):
+    global _worker_campaign
+
+    clazz = setup()
+    _warm_reference_syntax_trees(fuzzing_advice)
+    fuzz_clazz(clazz, fuzzing_advice, **fuzzing_options)
+
+    _worker_campaign = (clazz, trial, seed)
+
+
+def trial_random(seed, trial_index):
+    """
+    :return : the random number stream used by fuzzers during the indexed trial of a campaign with the given seed, so
+    that the fuzzing decisions of any trial can be regenerated independently of the worker that ran it.
+    """
+    return CounterRandom(seed, stream=trial_index)
+
+
+def _run_trials(first_trial_index, trial_count):
+    clazz, trial, seed = _worker_campaign
+
+    outcomes = list()
+    for trial_index in range(first_trial_index, first_trial_index + trial_count):
+        with random_stream(trial_random(seed, trial_index)):
+            outcomes.append(trial(clazz))
+    return outcomes
+
+
+def _default_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    else:
+        return multiprocessing.get_context()
+
+
+def run_campaign(setup, fuzzing_advice, trial, trials, workers=None, seed=None, chunk_size=None, mp_context=None,
+                 **fuzzing_options):
+    """
+    Runs repeated trials of a fuzzed workflow across a pool of worker processes, yielding the outcome of each trial, in
+    trial order, as chunks of trials complete.
+
+    Each worker calls setup to obtain the class to be fuzzed, pre-warms the reference syntax trees of the advised
+    functions and then weaves the fuzzing advice into the class, as for fuzz_clazz.  Each trial draws its fuzzing
+    decisions from its own random stream (see trial_random), derived from the campaign seed and the trial index.
+
+    :param setup: a 0-ary function, invoked once in each worker, that returns the class to be fuzzed.
+    :param fuzzing_advice: the fuzzing advice dictionary to weave into the class.
+    :param trial: a function that accepts the fuzzed class and performs a single trial, returning its outcome.
+    :param trials: the number of trials to run.
+    :param workers: the number of worker processes, by default the number of processors.
+    :param seed: the campaign seed.  A seed is drawn from pydysofu_random if none is given.
+    :param chunk_size: the number of trials sent to a worker at a time.
+    :param mp_context: the multiprocessing context used to start workers.  The fork context is used by default where
+    available, so that the setup, trial and advice need not be picklable; otherwise they must be.
+    :param fuzzing_options: keyword options passed to fuzz_clazz.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    seed = pydysofu_random.getrandbits(64) if seed is None else seed
+    chunk_size = chunk_size or max(1, min(1000, trials // (4 * workers)))
+
+    _warm_reference_syntax_trees(fuzzing_advice)
+
+    first_trial_indices = range(0, trials, chunk_size)
+    trial_counts = [min(chunk_size, trials - first_trial_index) for first_trial_index in first_trial_indices]
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context or _default_context(),
+        initializer=_initialise_worker,
+        initargs=(setup, fuzzing_advice, trial, seed, fuzzing_options))
+
+    try:
+        for outcomes in executor.map(_run_trials, first_trial_indices, trial_counts):
+            for outcome in outcomes:
+                yield outcome
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
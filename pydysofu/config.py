@@ -1,3 +1,152 @@
+import hashlib
+import os
+
+from collections.abc import Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
 from random import Random
 
 pydysofu_random = Random()
+
+
+class CounterRandom(Random):
+    """
+    A counter based pseudo random number generator.  Each 64 bit block of randomness is derived by hashing the
+    generator's key, computed from a seed and a stream identifier, together with the index of the block.  A generator's
+    draws can therefore be regenerated from any point by a new generator with the same seed, stream and counter,
+    independently of any other generator.
+    """
+
+    def __init__(self, seed=None, stream=0, counter=0):
+        self.stream = stream
+        Random.__init__(self, seed)
+        self.counter = counter
+
+    def seed(self, a=None, version=2):
+        if a is None:
+            a = os.urandom(16).hex()
+        self._key = hashlib.blake2b(('%r:%r' % (a, self.stream)).encode('utf-8'), digest_size=32).digest()
+        self.counter = 0
+        self.gauss_next = None
+
+    def _next_block(self):
+        block = hashlib.blake2b(self.counter.to_bytes(8, 'little'), key=self._key, digest_size=8).digest()
+        self.counter += 1
+        return int.from_bytes(block, 'little')
+
+    def random(self):
+        return (self._next_block() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):
+        if k < 0:
+            raise ValueError('number of bits must be non-negative')
+        bits = 0
+        for i in range(0, k, 64):
+            bits |= self._next_block() << i
+        return bits & ((1 << k) - 1)
+
+    def getstate(self):
+        return self._key, self.counter, self.gauss_next
+
+    def setstate(self, state):
+        self._key, self.counter, self.gauss_next = state
+
+
+class BatchedRandom(Random):
+    """
+    A random number generator that draws whole sample and shuffle decisions for many invocations at once with
+    vectorised NumPy calls, and hands them out from buffers: single indices and small samples of indices for sample,
+    and permutations for shuffle.  Each decision has the same distribution as the corresponding Random method.
+    Samples and permutations of populations larger than max_population, and the remaining Random methods, such as the
+    uniform draws of choose_from, use Random's own generator, seeded from the same seed, as a single draw is already
+    cheaper than a buffered one.  Install a BatchedRandom for fuzzers with random_stream.  Requires NumPy.
+    """
+
+    def __init__(self, seed=None, batch_size=1024, max_population=64):
+        """
+        :param seed: the seed of the NumPy generator, or None to draw a seed from pydysofu_random, so that batched
+        streams created after seeding pydysofu_random are reproducible.
+        :param batch_size: the number of decisions of each kind drawn at once.
+        :param max_population: the largest population sampled or shuffled by batched decisions.
+        """
+        self.batch_size = batch_size
+        self.max_population = max_population
+        Random.__init__(self, seed)
+
+    def seed(self, a=None, version=2):
+        import numpy
+
+        if a is None:
+            a = pydysofu_random.getrandbits(128)
+        elif not isinstance(a, int):
+            a = int.from_bytes(hashlib.blake2b(repr(a).encode('utf-8'), digest_size=16).digest(), 'little')
+        Random.seed(self, a)
+        self._generator = numpy.random.Generator(numpy.random.PCG64(a))
+        self._indices = dict()
+
+    def _next_indices(self, n, k):
+        """
+        :return : a list of k distinct indices below n in uniformly random order, from a buffer of such lists.
+        """
+        buffer = self._indices.get((n, k))
+        if not buffer:
+            if k == 1:
+                buffer = [[i] for i in self._generator.integers(0, n, self.batch_size).tolist()]
+            else:
+                # Sorting independent uniform keys gives a uniformly random permutation of each row.
+                buffer = self._generator.random((self.batch_size, n)).argsort(axis=1)[:, :k].tolist()
+            self._indices[(n, k)] = buffer
+        return buffer.pop()
+
+    def sample(self, population, k, *, counts=None):
+        n = len(population)
+        if (counts is not None or not 0 < k <= n or n > self.max_population or
+                type(population) not in _indexable_types and not isinstance(population, Sequence)):
+            return Random.sample(self, population, k, counts=counts)
+        return [population[i] for i in self._next_indices(n, k)]
+
+    def shuffle(self, x):
+        n = len(x)
+        if n > self.max_population:
+            Random.shuffle(self, x)
+        elif n > 1:
+            x[:] = [x[i] for i in self._next_indices(n, n)]
+
+    def getstate(self):
+        indices = {key: [list(i) for i in buffer] for key, buffer in self._indices.items()}
+        return Random.getstate(self), self._generator.bit_generator.state, indices
+
+    def setstate(self, state):
+        random_state, bit_generator_state, indices = state
+        Random.setstate(self, random_state)
+        self._generator.bit_generator.state = bit_generator_state
+        self._indices = {key: [list(i) for i in buffer] for key, buffer in indices.items()}
+
+
+_indexable_types = {list, tuple, range}
+
+
+_current_random = ContextVar('pydysofu_current_random', default=None)
+
+
+def current_random():
+    """
+    :return : the random number generator used by fuzzers in the current context, which is pydysofu_random unless a
+    different stream has been selected with random_stream.
+    """
+    stream = _current_random.get()
+    return pydysofu_random if stream is None else stream
+
+
+@contextmanager
+def random_stream(stream):
+    """
+    A context manager that selects the random number generator used by fuzzers within the context, including fuzzers
+    invoked by the current thread or asyncio task only.
+    :param stream: a Random instance, such as a CounterRandom.
+    """
+    token = _current_random.set(stream)
+    try:
+        yield stream
+    finally:
+        _current_random.reset(token)
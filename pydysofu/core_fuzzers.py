@@ -4,6 +4,11 @@ Provides a library of standard fuzz operators for work flows that can be assembl
 All fuzz operators are of the form fuzzer(steps, context). Steps is the sequence of steps of a method or function
 that may be altered by the fuzzer. The context is the method's bound object, or None if an unbound function is fuzzed.
 
+Fuzzers own the list of steps they are given, but not the steps themselves, which may be shared with the reference
+syntax tree or with other steps.  A step must be copied (see writable_step) before it is modified.  Fuzzers that insert
+the same nodes more than once, or nodes held by the fuzzer itself, share them only while copy on write is active (see
+shareable).
+
 @author probablytom
 @author twsswt
 """
@@ -13,46 +18,190 @@ import ast
 import _ast
 from ast import If, While
 
-from threading import Lock
+from collections.abc import Mapping
+
+from threading import Lock, local
+
+from contextlib import contextmanager
 
 import copy
 
 import inspect
 
-from .find_lambda import find_lambda_ast
-from .config import pydysofu_random
+import re
+
+from .find_lambda import lambda_ast
+from .fuzzer_trace import record_application, trace_recorder, traced_region
+from .fuzzing_events import FUZZER_APPLIED, publish_event
+from .snippet_cache import snippet
+from .config import current_random
+from .weighted_choice import CumulativeWeights
 
 
 # Logging Machinery
 
-_fuzzer_invocations_lock = Lock()
-fuzzer_invocations = dict()
+class _InvocationCounterShard(object):
 
+    __slots__ = ('counts', 'workflow_counts', 'total')
 
-def fuzzer_invocations_count(workflow=None):
+    def __init__(self):
+        self.counts = dict()
+        self.workflow_counts = dict()
+        self.total = 0
+
+
+class InvocationCounters(Mapping):
+    """
+    A read only mapping from (workflow class, fuzzer) keys to fuzzer invocation counts.  Each thread records invocations
+    in its own shard, without acquiring a shared lock, and shards are merged when the counters are read.  Counts are
+    also indexed by workflow class.
+    """
+
+    def __init__(self):
+        self._shards = list()
+        self._shards_lock = Lock()
+        self._local = local()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _InvocationCounterShard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def increment(self, workflow, fuzzer):
+        shard = self._shard()
+        key = (workflow, fuzzer)
+        shard.counts[key] = shard.counts.get(key, 0) + 1
+        shard.workflow_counts[workflow] = shard.workflow_counts.get(workflow, 0) + 1
+        shard.total += 1
+
+    def count(self, workflow=None):
+        if workflow is None:
+            return sum(shard.total for shard in self._shards)
+        else:
+            return sum(shard.workflow_counts.get(workflow, 0) for shard in self._shards)
+
+    def clear(self):
+        for shard in list(self._shards):
+            shard.counts.clear()
+            shard.workflow_counts.clear()
+            shard.total = 0
+
+    def _merged_counts(self):
+        merged = dict()
+        for shard in list(self._shards):
+            for key, count in shard.counts.copy().items():
+                merged[key] = merged.get(key, 0) + count
+        return merged
 
-    filtered_values = \
-        filter(lambda t: t[0][0] == workflow, fuzzer_invocations.items()) if workflow is not None \
-        else fuzzer_invocations.items()
+    def __getitem__(self, key):
+        count = sum(shard.counts.get(key, 0) for shard in self._shards)
+        if count == 0:
+            raise KeyError(key)
+        return count
 
-    return sum(map(lambda t: t[1], filtered_values))
+    def __iter__(self):
+        return iter(self._merged_counts())
+
+    def __len__(self):
+        return len(self._merged_counts())
+
+
+fuzzer_invocations = InvocationCounters()
+
+
+def fuzzer_invocations_count(workflow=None):
+    return fuzzer_invocations.count(workflow)
 
 
 def reset_invocation_counters():
-    global fuzzer_invocations
-    fuzzer_invocations = dict()
+    fuzzer_invocations.clear()
 
 
 def log_invocation(func):
     def func_wrapper(*args, **kwargs):
-        _fuzzer_invocations_lock.acquire()
-        key = (args[1].__class__, func)
-        fuzzer_invocations[key] = fuzzer_invocations.get(key, 0) + 1
-        _fuzzer_invocations_lock.release()
+        fuzzer_invocations.increment(args[1].__class__, func)
+        record_application(func, args[1])
+        publish_event(FUZZER_APPLIED, fuzzer=func, context=args[1])
         return func(*args, **kwargs)
     return func_wrapper
 
 
+# Decision Recording Machinery
+
+_decision_tapes = local()
+
+
+def record_decision(decision):
+    """
+    Records a (hashable) decision taken by a stochastic or stateful fuzzer, if decisions are being recorded on the
+    current thread.  Fuzzers that draw on randomness other than current_random(), or that depend on external state,
+    should record what they decided so that compiled mutants can be cached safely.
+    """
+    decisions = getattr(_decision_tapes, 'decisions', None)
+    if decisions is not None:
+        decisions.append(decision)
+
+
+@contextmanager
+def recording_decisions():
+    """
+    A context manager that collects the decisions recorded by fuzzers applied on the current thread into the yielded
+    list.
+    """
+    enclosing_decisions = getattr(_decision_tapes, 'decisions', None)
+    decisions = list()
+    _decision_tapes.decisions = decisions
+    try:
+        yield decisions
+    finally:
+        _decision_tapes.decisions = enclosing_decisions
+
+
+# Copy on Write Machinery
+
+_copy_on_write = local()
+
+
+@contextmanager
+def copying_on_write():
+    """
+    A context manager within which the fuzzers applied on the current thread fuzz syntax trees that are copied on write,
+    so that fuzzers may share nodes between steps.
+    """
+    enclosing = getattr(_copy_on_write, 'active', False)
+    _copy_on_write.active = True
+    try:
+        yield
+    finally:
+        _copy_on_write.active = enclosing
+
+
+def copy_on_write_active():
+    return getattr(_copy_on_write, 'active', False)
+
+
+def shareable(nodes):
+    """
+    :return : the node, or list of nodes, if copy on write is active on the current thread, or a deep copy otherwise.
+    Fuzzers pass nodes they insert more than once, or hold themselves, through shareable, since a fuzzer that modifies
+    steps in place would otherwise modify every occurrence of a shared node.
+    """
+    return nodes if copy_on_write_active() else copy.deepcopy(nodes)
+
+
+def writable_step(steps, index):
+    """
+    Replaces the step at the given index of a list of steps with a shallow copy of the step, so that the copy can be
+    modified without altering syntax trees that share the original step.
+    :return : the copied step.
+    """
+    step = steps[index] = copy.copy(steps[index])
+    return step
+
+
 # Identity Fuzzer
 
 def identity(steps, context):
@@ -62,6 +211,14 @@ def identity(steps, context):
     return steps
 
 
+def is_identity(fuzzer):
+    """
+    :return : True if the fuzzer is known to leave steps unchanged, i.e. it is the identity fuzzer or a composite fuzzer
+    that only applies identity fuzzers.  Composite fuzzers record this in an is_identity attribute when constructed.
+    """
+    return fuzzer is identity or getattr(fuzzer, 'is_identity', False) is True
+
+
 # Step Filtering Functions
 
 def choose_identity(steps):
@@ -74,7 +231,8 @@ def choose_random_steps(n):
         if len(steps) <= n:
             return [(0, len(steps)-1)]
         else:
-            sample_indices = pydysofu_random.sample(range(0, len(steps) - 1), n)
+            sample_indices = current_random().sample(range(0, len(steps) - 1), n)
+            record_decision(tuple(sample_indices))
             return [(i, i+1) for i in sample_indices]
 
     return _choose_random_steps
@@ -88,7 +246,7 @@ def choose_last_steps(n, reapply=True):
             self.n = _n
             self.reapply = _reapply
 
-        def __call__(self, steps, context):
+        def __call__(self, steps, context=None):
 
             selected = list()
 
@@ -114,6 +272,7 @@ def choose_last_steps(n, reapply=True):
                 begin_index = end_index
 
             if not self.reapply:
+                record_decision(self.n)
                 self.n -= total_size
             return selected
 
@@ -125,43 +284,79 @@ def choose_last_step(steps):
     return func(steps)
 
 
-_ast_control_structure_types = {ast.For, ast.If, ast.Try, ast.While, ast.Return, ast.FunctionDef}
+_ast_control_structure_types = {
+    ast.For, ast.AsyncFor, ast.If, ast.Try, ast.While, ast.AsyncWith, ast.Return, ast.FunctionDef, ast.AsyncFunctionDef}
+
+
+def _statement_types(statement_type=ast.stmt):
+    for subclass in statement_type.__subclasses__():
+        yield subclass
+        yield from _statement_types(subclass)
+
+
+# Each statement type is encoded as a single byte, so that filters can locate regions of steps with regular expressions
+# over the encoded steps, rather than by testing the type of each step in a Python loop.  Code 0 is reserved for steps
+# that are not statements.
+_step_kind_codes = {statement_type: code for code, statement_type in enumerate(_statement_types(), 1)}
+
+
+def step_kinds(steps):
+    """
+    :return : a bytes object containing the code of the statement type of each step.
+    """
+    try:
+        return bytes(map(_step_kind_codes.__getitem__, map(type, steps)))
+    except KeyError:
+        return bytes(_step_kind_codes.get(type(step), 0) for step in steps)
+
+
+def _step_kind_pattern(step_types, negate=False):
+    """
+    :return : a compiled pattern matching a single encoded step whose type is (or, if negate is True, is not) one of
+    the step types.
+    """
+    codes = bytes(sorted(_step_kind_codes[step_type] for step_type in step_types))
+    if not codes:
+        return re.compile(b'(?s).' if negate else b'(?!)')
+    return re.compile(b'[%s%s]' % (b'^' if negate else b'', re.escape(codes)))
+
+
+def _boundary_regions(kinds, first_pattern, boundary_pattern):
+    """
+    :return : the regions that partition the steps from the first step matching the first pattern to the end of the
+    steps at each subsequent step matching the boundary pattern.  A final region consisting of a single boundary step
+    is omitted.
+    """
+    first = first_pattern.search(kinds)
+    if first is None:
+        return []
+
+    boundaries = [first.start()]
+    boundaries.extend(match.start() for match in boundary_pattern.finditer(kinds, first.start() + 1))
+    if len(boundaries) == 1 or boundaries[-1] < len(kinds) - 1:
+        boundaries.append(len(kinds))
+
+    return list(zip(boundaries, boundaries[1:]))
 
 
 def exclude_control_structures(target=_ast_control_structure_types):
 
+    control_pattern = _step_kind_pattern(_ast_control_structure_types & target)
+    other_pattern = _step_kind_pattern(_ast_control_structure_types & target, negate=True)
+
     def _exclude_control_structures(steps):
-        result = list()
-        start = 0
-        while start < len(steps) and type(steps[start]) in _ast_control_structure_types & target:
-            start += 1
-        end = start
-        while end < len(steps):
-            while end < len(steps) and type(steps[end]) not in _ast_control_structure_types & target:
-                end += 1
-            result.append((start, end))
-            start = end
-            end = start + 1
-
-        return result
+        return _boundary_regions(step_kinds(steps), other_pattern, control_pattern)
 
     return _exclude_control_structures
 
 
 def include_control_structures(target=_ast_control_structure_types):
+
+    control_pattern = _step_kind_pattern(_ast_control_structure_types & target)
+    other_pattern = _step_kind_pattern(_ast_control_structure_types & target, negate=True)
+
     def _include_control_structures(steps):
-        result = list()
-        start = 0
-        while start < len(steps) and type(steps[start]) not in _ast_control_structure_types & target:
-            start += 1
-        end = start
-        while end < len(steps):
-            while end < len(steps) and type(steps[end]) in _ast_control_structure_types & target:
-                end += 1
-            result.append((start, end))
-            start = end
-            end = start + 1
-        return result
+        return _boundary_regions(step_kinds(steps), control_pattern, other_pattern)
 
     return _include_control_structures
 
@@ -193,6 +388,16 @@ def invert(fuzz_filter):
 
 # Composite Fuzzers
 
+def _composite(composite_fuzzer, combinator, **components):
+    """
+    Makes a composite fuzzer inspectable, by recording the function that constructed it and the arguments it was
+    constructed with as its combinator and components attributes.
+    """
+    composite_fuzzer.combinator = combinator
+    composite_fuzzer.components = components
+    return composite_fuzzer
+
+
 def filter_context(fuzz_filters=[(lambda context: True, identity)]):
     """
     A composite fuzzer that accepts a sequence of context filter, fuzz operator tuples.  Each context filter must be a
@@ -202,12 +407,16 @@ def filter_context(fuzz_filters=[(lambda context: True, identity)]):
     def _filter_context(steps, context):
 
         for fuzz_filter, fuzzer in fuzz_filters:
-            if fuzz_filter(context):
+            satisfied = fuzz_filter(context)
+            record_decision(bool(satisfied))
+            if satisfied:
                 steps = fuzzer(steps, context)
 
         return steps
 
-    return _filter_context
+    _filter_context.is_identity = all(is_identity(fuzzer) for _, fuzzer in fuzz_filters)
+
+    return _composite(_filter_context, filter_context, fuzz_filters=fuzz_filters)
 
 
 def filter_steps(fuzz_filter=choose_identity, fuzzer=identity):
@@ -221,16 +430,46 @@ def filter_steps(fuzz_filter=choose_identity, fuzzer=identity):
     """
     def _filter_steps(steps, context):
         regions = fuzz_filter(steps)
+        tracing = trace_recorder() is not None
+
+        # Regions are assembled into a new list of steps in a single pass while they are in ascending order and the
+        # fuzzer preserves their lengths.  Otherwise, the remaining regions index the steps fuzzed so far, so each is
+        # replaced in place.
+        fuzzed_steps = list()
+        position = 0
+        for index, (start, end) in enumerate(regions):
+            if start < position or end < start:
+                break
 
-        for region in regions:
-            start = region[0]
-            end = region[1]
+            filtered_steps = steps[start:end]
+            if tracing:
+                fuzzed_region = traced_region(fuzzer, filtered_steps, context, start, end)
+            else:
+                fuzzed_region = fuzzer(filtered_steps, context)
+
+            fuzzed_steps.extend(steps[position:start])
+            fuzzed_steps.extend(fuzzed_region)
+            position = end
+
+            if len(fuzzed_region) != len(filtered_steps):
+                index += 1
+                break
+        else:
+            fuzzed_steps.extend(steps[position:])
+            return fuzzed_steps
 
+        steps = fuzzed_steps + steps[position:]
+        for start, end in regions[index:]:
             filtered_steps = steps[start:end]
-            steps[start:end] = fuzzer(filtered_steps, context)
+            if tracing:
+                steps[start:end] = traced_region(fuzzer, filtered_steps, context, start, end)
+            else:
+                steps[start:end] = fuzzer(filtered_steps, context)
         return steps
 
-    return _filter_steps
+    _filter_steps.is_identity = is_identity(fuzzer)
+
+    return _composite(_filter_steps, filter_steps, fuzz_filter=fuzz_filter, fuzzer=fuzzer)
 
 
 def in_sequence(sequence=()):
@@ -246,29 +485,36 @@ def in_sequence(sequence=()):
 
         return steps
 
-    return _in_sequence
+    _in_sequence.is_identity = all(is_identity(fuzzer) for fuzzer in sequence)
+
+    return _composite(_in_sequence, in_sequence, sequence=sequence)
 
 
-def choose_from(distribution=(1.0, lambda x: x)):
+def choose_from(distribution=((1.0, identity),)):
     """
-    A composite fuzz operator that selects a fuzz operator from the supplied probability distribution.
+    A composite fuzz operator that selects a fuzz operator from the supplied probability distribution.  The weights of
+    the distribution are precompiled into cumulative weights when the fuzz operator is created, so each selection takes
+    time logarithmic in the size of the distribution.
     :param distribution: the probability distribution from which to select a fuzz operator, represented as a sequence of
     (scalar weight, fuzzing operator) tuples.
-    :returns : a fuzz operator selected at random from the supplied probability distribution.
+    :returns : a fuzz operator selected at random from the supplied probability distribution.  The weight of the fuzz
+    operator at an index of the distribution can be changed with the reweight(index, weight) attribute of the returned
+    fuzz operator.
     """
 
+    fuzzers = [fuzzer for _, fuzzer in distribution]
+    cumulative_weights = CumulativeWeights(weight for weight, _ in distribution)
+
     def _choose_from(steps, context):
-        total_weight = sum(map(lambda t: t[0], distribution))
+        p = current_random().uniform(0.0, cumulative_weights.total)
 
-        p = pydysofu_random.uniform(0.0, total_weight)
+        index = cumulative_weights.find(p)
+        record_decision(index)
+        return fuzzers[index](steps, context)
 
-        up_to = 0.0
-        for weight, fuzzer in distribution:
-            up_to += weight
-            if up_to >= p:
-                return fuzzer(steps, context)
+    _choose_from.reweight = cumulative_weights.reweight
 
-    return _choose_from
+    return _composite(_choose_from, choose_from, distribution=distribution)
 
 
 def on_condition_that(condition, fuzzer):
@@ -281,7 +527,9 @@ def on_condition_that(condition, fuzzer):
 
     def _on_condition_that(steps, context):
         if hasattr(condition, '__call__'):
-            if condition():
+            satisfied = condition()
+            record_decision(bool(satisfied))
+            if satisfied:
                 return fuzzer(steps, context)
             else:
                 return steps
@@ -290,37 +538,104 @@ def on_condition_that(condition, fuzzer):
         else:
             return steps
 
-    return _on_condition_that
+    _on_condition_that.is_identity = is_identity(fuzzer) or not (hasattr(condition, '__call__') or condition)
+
+    return _composite(_on_condition_that, on_condition_that, condition=condition, fuzzer=fuzzer)
 
 
 def recurse_into_nested_steps(
         fuzzer=identity,
-        target_structures={ast.For, ast.Try, ast.While, ast.If},
+        target_structures={ast.For, ast.AsyncFor, ast.Try, ast.While, ast.If, ast.AsyncWith},
         min_depth=0,
         max_depth=2 ** 32):
     """
-    A composite fuzzer that applies the supplied fuzzer recursively to bodies of control statements (For, While,
-    Try and If).  Recursion is applied at the head, i.e. the fuzzer supplied is applied to the parent block last.
+    A composite fuzzer that applies the supplied fuzzer recursively to bodies of control statements (For, AsyncFor,
+    While, Try, If and AsyncWith).  Recursion is applied at the head, i.e. the fuzzer supplied is applied to the parent
+    block last.
     """
 
     def _recurse_into_nested_steps(steps, context, depth=0):
         if depth <= max_depth:
-            for step in steps:
-                if type(step) in {ast.For, ast.While} & target_structures:
-                    step.body = _recurse_into_nested_steps(step.body, context, depth + 1)
+            for index, step in enumerate(steps):
+                if type(step) in {ast.For, ast.AsyncFor, ast.While, ast.AsyncWith} & target_structures:
+                    step = writable_step(steps, index)
+                    step.body = _recurse_into_nested_steps(list(step.body), context, depth + 1)
                 elif type(step) in {ast.If} & target_structures:
-                    step.body = _recurse_into_nested_steps(step.body, context, depth + 1)
-                    step.orelse = _recurse_into_nested_steps(step.orelse, context, depth + 1)
+                    step = writable_step(steps, index)
+                    step.body = _recurse_into_nested_steps(list(step.body), context, depth + 1)
+                    step.orelse = _recurse_into_nested_steps(list(step.orelse), context, depth + 1)
                 elif type(step) in {ast.Try} & target_structures:
-                    step.body = _recurse_into_nested_steps(step.body, context, depth + 1)
-                    for handler in step.handlers:
-                        _recurse_into_nested_steps(handler.body, context, depth + 1)
+                    step = writable_step(steps, index)
+                    step.body = _recurse_into_nested_steps(list(step.body), context, depth + 1)
+                    step.handlers = list(step.handlers)
+                    for handler_index in range(len(step.handlers)):
+                        handler = writable_step(step.handlers, handler_index)
+                        handler.body = _recurse_into_nested_steps(list(handler.body), context, depth + 1)
         if depth >= min_depth:
             return fuzzer(steps, context)
         else:
             return steps
 
-    return _recurse_into_nested_steps
+    _recurse_into_nested_steps.is_identity = is_identity(fuzzer)
+
+    return _composite(
+        _recurse_into_nested_steps, recurse_into_nested_steps,
+        fuzzer=fuzzer, target_structures=target_structures, min_depth=min_depth, max_depth=max_depth)
+
+
+def simplify(fuzzer):
+    """
+    Simplifies a composite fuzzer, so that applying it does no more work than the fuzzers it actually applies.  Identity
+    stages are removed, constant conditions are folded, nested sequences are flattened, and filters that select all of
+    the steps, or all of the steps selected by an enclosing filter, are merged.  Note that any random draws made by
+    filters whose fuzzers are identities are skipped, as they are by the weaver.  Distributions built by choose_from are
+    not rebuilt, so that they can still be reweighted.
+    :return : a fuzzer that is equivalent to the supplied fuzzer.
+    """
+    if is_identity(fuzzer):
+        return identity
+
+    combinator = getattr(fuzzer, 'combinator', None)
+    components = getattr(fuzzer, 'components', None)
+
+    if combinator is in_sequence:
+        sequence = list()
+        for stage in map(simplify, components['sequence']):
+            if getattr(stage, 'combinator', None) is in_sequence:
+                sequence.extend(stage.components['sequence'])
+            elif stage is not identity:
+                sequence.append(stage)
+        if len(sequence) == 0:
+            return identity
+        elif len(sequence) == 1:
+            return sequence[0]
+        return in_sequence(sequence)
+
+    elif combinator is on_condition_that:
+        condition = components['condition']
+        if not hasattr(condition, '__call__'):
+            return simplify(components['fuzzer']) if condition else identity
+        return on_condition_that(condition, simplify(components['fuzzer']))
+
+    elif combinator is filter_steps:
+        fuzz_filter = components['fuzz_filter']
+        inner = simplify(components['fuzzer'])
+        if fuzz_filter is choose_identity:
+            return inner
+        while getattr(inner, 'combinator', None) is filter_steps and inner.components['fuzz_filter'] is choose_identity:
+            inner = inner.components['fuzzer']
+        return filter_steps(fuzz_filter, inner)
+
+    elif combinator is filter_context:
+        fuzz_filters = [(f, simplify(stage)) for f, stage in components['fuzz_filters']]
+        return filter_context([(f, stage) for f, stage in fuzz_filters if stage is not identity])
+
+    elif combinator is recurse_into_nested_steps:
+        arguments = dict(components)
+        arguments['fuzzer'] = simplify(components['fuzzer'])
+        return recurse_into_nested_steps(**arguments)
+
+    return fuzzer
 
 
 # Atomic Fuzzers
@@ -331,8 +646,8 @@ def replace_condition_with(condition=False):
     :param condition: The supplied condition that will be converted into a Python AST boolean expression. The condition
     can be supplied as a:
 
-      * a lambda expression, *provided that* the expression is defined in a single line of code and is enclosed in
-        brackets, for example (lambda: False)
+      * a lambda expression, for example lambda: False, which may span several lines and need not be enclosed in
+        brackets
       * a function reference
       * string boolean expression, such as '1==2'
 
@@ -340,24 +655,27 @@ def replace_condition_with(condition=False):
 
     """
 
+    is_function = inspect.isfunction(condition)
+
+    # Lambda expressions and string conditions are located and parsed once, when the fuzzer is built.
+    condition_lambda_ast = lambda_ast(condition) if is_function and condition.__name__ == '<lambda>' else None
+    condition_snippet = snippet(condition, 'eval') if type(condition) is str else None
+
     def build_replacement(step):
 
-        if type(condition) is str:
-            parsed_ast = ast.parse('if %s: pass\nelse: False' % condition)
-            return parsed_ast.body[0].test
+        if condition_snippet is not None:
+            return shareable(condition_snippet.expression())
 
         elif hasattr(condition, '__call__'):
 
-            if hasattr(condition, 'func_name'):
-
-                if condition.func_name == '<lambda>':
+            if is_function:
 
-                    containing_string = inspect.getsource(condition).strip()
-                    func_ast = find_lambda_ast(containing_string, condition).value
+                if condition_lambda_ast is not None:
+                    func_ast = shareable(condition_lambda_ast)
 
                 else:
                     func_ast = ast.Name(
-                        id=condition.func_name,
+                        id=condition.__name__,
                         lineno=step.lineno,
                         col_offset=step.col_offset,
                         ctx=ast.Load()
@@ -385,15 +703,16 @@ def replace_condition_with(condition=False):
     @log_invocation
     def _replace_condition(steps, context):
 
-        for step in steps:
+        for index, step in enumerate(steps):
             if type(step) is If or type(step) is While:
+                step = writable_step(steps, index)
                 step.test = build_replacement(step)
         return steps
 
-    if hasattr(condition, '__call__') and hasattr(condition, 'func_name') and condition.func_name != '<lambda>':
+    if is_function and condition_lambda_ast is None:
 
         return in_sequence([
-            insert_steps(0, "from %s import %s" % (condition.__module__, condition.func_name)),
+            insert_steps(0, "from %s import %s" % (condition.__module__, condition.__name__)),
             _replace_condition,
         ])
 
@@ -409,8 +728,9 @@ def replace_for_iterator_with(replacement=()):
 
     @log_invocation
     def _replace_iterator_with(steps, context):
-        for step in steps:
+        for index, step in enumerate(steps):
             if type(step) is ast.For:
+                step = writable_step(steps, index)
 
                 if type(replacement) is list:
                     elements = []
@@ -438,17 +758,19 @@ def replace_for_iterator_with(replacement=()):
 def replace_steps_with(start=0, end=None, replacement='pass'):
     """
     Replaces one or more lines of code with the specified replacement.  The portion of the code block to be replaced is
-    given by the start and end index.
+    given by the start and end index.  A replacement string is parsed once, when the fuzzer is built, and its
+    statements are shared by every fuzzed block.
     """
 
+    replacement_snippet = snippet(replacement) if type(replacement) is str else None
+
     @log_invocation
     def _replace_steps(steps, context):
 
         finish = len(steps) if end is None else min(end, len(steps))
 
-        if type(replacement) is str:
-            parsed_ast = ast.parse(replacement)
-            steps[start:finish] = parsed_ast.body
+        if replacement_snippet is not None:
+            steps[start:finish] = shareable(replacement_snippet.statements())
 
         elif type(replacement) is ast.Pass:
             steps[start:finish] = [replacement]
@@ -458,7 +780,6 @@ def replace_steps_with(start=0, end=None, replacement='pass'):
     return _replace_steps
 
 
-@log_invocation
 def insert_steps(position, insert):
     """
     Inserts one or more lines of code into a target set of steps.
@@ -466,8 +787,10 @@ def insert_steps(position, insert):
     :param insert: The inserted lines of code are represented as a single string.  Lines of code should be separated by
      a \n carriage return.
     """
+    fuzzer = replace_steps_with(position, position, insert)
+
+    # The replacement fuzzer logs each application.
     def _insert_steps(steps, context):
-        fuzzer = replace_steps_with(position, position, insert)
         return fuzzer(steps, context)
 
     return _insert_steps
@@ -480,20 +803,22 @@ def replace_steps_with_pass(steps, context):
 
 @log_invocation
 def duplicate_steps(steps, context):
-    return steps + copy.deepcopy(steps)
+    return steps + shareable(steps)
 
 
 @log_invocation
 def shuffle_steps(steps, context):
-    result = list(steps)
-    pydysofu_random.shuffle(result)
-    return result
+    order = list(range(len(steps)))
+    current_random().shuffle(order)
+    record_decision(tuple(order))
+    return [steps[i] for i in order]
 
 
 @log_invocation
 def swap_if_blocks(steps, context):
-    for step in steps:
+    for index, step in enumerate(steps):
         if type(step) is If:
+            step = writable_step(steps, index)
             temp = step.body
             step.body = step.orelse
             step.orelse = temp
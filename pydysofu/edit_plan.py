@@ -0,0 +1,116 @@
+"""
+Edit plans: a compact, declarative description of the changes made by a fuzzer to the top level steps of a reference
+function.  A plan is a tuple of operations, each producing one or more steps of the fuzzed body:
+
+ * ('steps', start, end): the reference steps from start to end, which together describe removed, duplicated and
+   permuted steps.
+ * ('pass',): an inserted pass statement, as produced when steps are replaced with pass.
+ * ('swap_branches', index): the indexed reference step with its body and orelse blocks swapped.
+ * ('replace_test', index, source): the indexed reference step with its test replaced by the expression source.
+ * ('statement', source): any other inserted or replaced statement, given by its source.
+
+Plans contain only tuples, strings and integers, so they are hashable and can be serialised with json, marshal or
+pickle.  Plans are derived from the steps returned by fuzzers that respect the copy on write discipline of the core
+fuzzers, applied while copy on write is active (see core_fuzzers.copying_on_write), since reference steps are
+recognised by identity.
+@author twsswt
+"""
+
+import ast
+import copy
+
+
+def _reference_indices(reference_steps):
+    step_indices = dict()
+    block_indices = dict()
+    for index, step in enumerate(reference_steps):
+        step_indices.setdefault(id(step), index)
+        for field in ('body', 'orelse'):
+            block = getattr(step, field, None)
+            if isinstance(block, list):
+                block_indices.setdefault(id(block), index)
+    return step_indices, block_indices
+
+
+def _same_fields(step, reference_step, excluded):
+    return type(step) is type(reference_step) and all(
+        getattr(step, field, None) is getattr(reference_step, field, None)
+        for field in step._fields if field not in excluded)
+
+
+def _step_operation(step, reference_steps, block_indices):
+    if type(step) is ast.Pass:
+        return 'pass',
+
+    index = block_indices.get(id(getattr(step, 'body', None)), block_indices.get(id(getattr(step, 'orelse', None))))
+    if index is not None:
+        reference_step = reference_steps[index]
+        if _same_fields(step, reference_step, {'test'}):
+            return 'replace_test', index, ast.unparse(step.test)
+        elif (_same_fields(step, reference_step, {'body', 'orelse'}) and
+              step.body is reference_step.orelse and step.orelse is reference_step.body):
+            return 'swap_branches', index
+
+    return 'statement', ast.unparse(step)
+
+
+def derive_edit_plan(reference_steps, fuzzed_steps):
+    """
+    :return : the edit plan that produces the fuzzed steps from the reference steps.
+    """
+    step_indices, block_indices = _reference_indices(reference_steps)
+
+    plan = list()
+    for step in fuzzed_steps:
+        index = step_indices.get(id(step))
+        if index is None:
+            plan.append(_step_operation(step, reference_steps, block_indices))
+        elif plan and plan[-1][0] == 'steps' and plan[-1][2] == index:
+            plan[-1] = ('steps', plan[-1][1], index + 1)
+        else:
+            plan.append(('steps', index, index + 1))
+    return tuple(plan)
+
+
+def _located(node, location):
+    for child in ast.walk(node):
+        if 'lineno' in child._attributes:
+            ast.copy_location(child, location)
+    return node
+
+
+def apply_edit_plan(reference_steps, plan, location=None):
+    """
+    :param location: the node whose location is given to steps and expressions created from source, by default the
+    first reference step.
+    :return : a new list of steps produced by applying the edit plan to the reference steps.  Unchanged reference steps
+    are shared with the reference steps and changed steps are shallow copies.
+    """
+    location = reference_steps[0] if location is None else location
+
+    steps = list()
+    for operation in plan:
+        kind = operation[0]
+        if kind == 'steps':
+            steps.extend(reference_steps[operation[1]:operation[2]])
+
+        elif kind == 'pass':
+            steps.append(_located(ast.Pass(), location))
+
+        elif kind == 'swap_branches':
+            step = copy.copy(reference_steps[operation[1]])
+            step.body, step.orelse = step.orelse, step.body
+            steps.append(step)
+
+        elif kind == 'replace_test':
+            step = copy.copy(reference_steps[operation[1]])
+            step.test = _located(ast.parse(operation[2], mode='eval').body, step)
+            steps.append(step)
+
+        elif kind == 'statement':
+            steps.extend(_located(statement, location) for statement in ast.parse(operation[1]).body)
+
+        else:
+            raise ValueError('unknown edit plan operation %r' % (kind,))
+
+    return steps
@@ -1,38 +1,211 @@
 """
 Utility routines for extracting lambda expressions from source files.
+
+Lambda expressions are located by tokenizing their source, rather than by compiling successively longer substrings,
+and the syntax tree of each lambda function is cached against its code object.
 @twsswt
 """
 
 import ast
+import inspect
+import io
+import tokenize
+import warnings
 
+_OPENING_BRACKETS = {'(', '[', '{'}
 
-def find_candidate_object(offset, source_line):
-    start = source_line.index('lambda', offset)-1
-    end = start + 7
+_CLOSING_BRACKETS = {')', ']', '}'}
+
+_lambda_syntax_trees = dict()
+
+
+def _tokens(source):
+    """
+    :return : the tokens of the source, ending early if the source ends within a bracketed expression, as a source
+    fragment extracted from a larger statement may do.
+    """
+    tokens = list()
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            tokens.append(token)
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return tokens
+
+
+def _lambda_end(tokens, index):
+    """
+    :return : the (row, column) position at which the lambda expression beginning with the indexed token ends.
+    """
+    depth = 0
+    pending_colons = 1
+    for token in tokens[index + 1:]:
+        if token.type == tokenize.OP and token.string in _OPENING_BRACKETS:
+            depth += 1
+        elif token.type == tokenize.OP and token.string in _CLOSING_BRACKETS:
+            if depth == 0:
+                return token.start
+            depth -= 1
+        elif token.type in {tokenize.NEWLINE, tokenize.ENDMARKER}:
+            return token.start
+        elif depth == 0:
+            if token.type == tokenize.NAME and token.string == 'lambda':
+                pending_colons += 1
+            elif token.type == tokenize.OP and token.string == ':' and pending_colons:
+                pending_colons -= 1
+            elif pending_colons == 0 and (
+                    token.type == tokenize.OP and token.string in {',', ';', ':', '=', '->'} or
+                    token.type == tokenize.NAME and token.string in {'for', 'async'}):
+                return token.start
+    return tokens[-1].end
 
-    while end <= len(source_line):
-        try:
-            candidate_source = source_line[start:end]
-            return compile(candidate_source, filename='blank', mode='exec').co_consts[0], candidate_source, end
-        except SyntaxError:
-            end += 1
+
+def lambda_extents(source):
+    """
+    :return : a list of ((row, column), (row, column), source) triples giving the start, end and source of each lambda
+    expression in the source, in order of their starting positions.  Rows are numbered from 1, and columns are offsets
+    in characters.
+    """
+    lines = source.splitlines(True)
+    tokens = _tokens(source)
+
+    extents = list()
+    for index, token in enumerate(tokens):
+        if token.type == tokenize.NAME and token.string == 'lambda':
+            start, end = token.start, _lambda_end(tokens, index)
+            fragment = lines[start[0] - 1:end[0]]
+            fragment[-1] = fragment[-1][:end[1]] if start[0] < end[0] else fragment[-1][start[1]:end[1]]
+            if start[0] < end[0]:
+                fragment[0] = fragment[0][start[1]:]
+            extents.append((start, end, ''.join(fragment).strip()))
+    return extents
+
+
+def _parse_lambda(lambda_source):
+    return ast.parse('(%s)' % lambda_source, mode='eval').body
+
+
+def _compiled_lambda(lambda_source):
+    for const in compile('(%s)' % lambda_source, filename='<lambda>', mode='eval').co_consts:
+        if inspect.iscode(const):
+            return const
+
+
+def _constants(code):
+    return tuple(const for const in code.co_consts if not inspect.iscode(const))
+
+
+def _same_byte_code(candidate_code, code):
+    return (candidate_code is not None and candidate_code.co_code == code.co_code and
+            candidate_code.co_names == code.co_names and _constants(candidate_code) == _constants(code))
 
 
 def find_lambda_ast(source_line, lambda_object):
     """
     Searches for the source code representation of the supplied lambda object within the line of code. Note that the
-    source line does not have to be a valid Python statement or expression, but *the search assumes that the lambda
-    expression is delimited by brackets*. Compiled byte codes and name declarations from the supplied lambda_object
-    are compared against potential candidates, since a source line may contain several lambda functions.
+    source line does not have to be a valid Python statement or expression. Compiled byte codes, constants and name
+    declarations from the supplied lambda_object are compared against potential candidates, since a source line may
+    contain several lambda functions.
 
     :param source_line: the line of code to search.
-    :param lambda_object: the compiled representation of the lambda expression.
-    :return : An AST representation of the lambda expression.
+    :param lambda_object: the lambda function, or its code object.
+    :return : An AST representation of the lambda expression, as an expression statement, or None if the lambda
+    expression is not found.
+    """
+    code = getattr(lambda_object, '__code__', lambda_object)
+
+    for _, _, lambda_source in lambda_extents(source_line):
+        try:
+            if _same_byte_code(_compiled_lambda(lambda_source), code):
+                return ast.Expr(value=_parse_lambda(lambda_source))
+        except SyntaxError:
+            continue
+    return None
+
+
+def _offset(lines, position):
+    row, column = position
+    return sum(len(line) for line in lines[:row - 1]) + column
+
+
+def find_candidate_object(offset, source_line):
+    """
+    Deprecated: lambda expressions are located with lambda_extents, and their syntax trees with find_lambda_ast or
+    lambda_ast.
+    :return : a (code object, source, end offset) triple for the first lambda expression in the source line that starts
+    at or after the offset.
+    :raises ValueError: if there is no such lambda expression.
+    """
+    warnings.warn('find_candidate_object is deprecated, use lambda_extents', DeprecationWarning, stacklevel=2)
+
+    lines = source_line.splitlines(True)
+    for start, end, lambda_source in lambda_extents(source_line):
+        if _offset(lines, start) >= offset:
+            return _compiled_lambda(lambda_source), lambda_source, _offset(lines, end)
+    raise ValueError('no lambda expression found after offset %d' % offset)
+
+
+def _byte_offset(line, column):
+    return len(line[:column].encode('utf-8'))
+
+
+def _body_span(code):
     """
-    offset = 0
-    while True:
-        candidate_object, candidate_source, offset = find_candidate_object(offset, source_line)
+    :return : the ((line, column), (end line, end column)) span of the source of the code object's instructions, or
+    None if the code object does not record the positions of its instructions.
+    """
+    positions = [
+        position for position in getattr(code, 'co_positions', lambda: ())()
+        if None not in position and (position[0], position[2]) != (position[1], position[3])
+    ]
+    if not positions:
+        return None
+    return min((p[0], p[2]) for p in positions), max((p[1], p[3]) for p in positions)
+
+
+def lambda_ast(lambda_function):
+    """
+    Locates the syntax tree of the lambda expression that defined the lambda function.  Where the function's code object
+    records the positions of its instructions, the innermost lambda expression whose body encloses them is chosen.
+    Otherwise, the lambda expressions on the first line of the function are compared by their compiled byte code.
+    Results are cached per code object, so the returned syntax tree is shared and must not be modified.
+
+    :param lambda_function: a function defined by a lambda expression.
+    :return : the ast.Lambda node of the function.
+    :raises ValueError: if the lambda expression cannot be located in the function's source.
+    """
+    code = lambda_function.__code__
+
+    syntax_tree = _lambda_syntax_trees.get(code)
+    if syntax_tree is not None:
+        return syntax_tree
+
+    source_lines, first_line = inspect.getsourcelines(code)
+    first_line = max(first_line, 1)
+    extents = lambda_extents(''.join(source_lines))
+
+    def absolute(position, byte_offset=False):
+        row, column = position
+        if byte_offset and row <= len(source_lines):
+            column = _byte_offset(source_lines[row - 1], column)
+        return row + first_line - 1, column
+
+    body_span = _body_span(code)
+    if body_span is not None:
+        enclosing = [
+            lambda_source for start, end, lambda_source in extents
+            if absolute(start, True) < body_span[0] and body_span[1] <= absolute(end, True)
+        ]
+        candidates = enclosing[-1:]
+    else:
+        candidates = [
+            lambda_source for start, _, lambda_source in extents if absolute(start)[0] == code.co_firstlineno
+        ]
+        if len(candidates) > 1:
+            candidates = [c for c in candidates if _same_byte_code(_compiled_lambda(c), code)][:1]
+
+    if not candidates:
+        raise ValueError('the source of lambda function %r cannot be located' % lambda_function)
 
-        if candidate_object.co_code == lambda_object.func_code.co_code:
-            if candidate_object.co_names == lambda_object.func_code.co_names:
-                return ast.parse(candidate_source).body[0]
+    syntax_tree = _lambda_syntax_trees[code] = _parse_lambda(candidates[0])
+    return syntax_tree
@@ -0,0 +1,44 @@
+"""
+Canonical structural fingerprints of Python syntax trees.
+@author twsswt
+"""
+
+import ast
+
+_node_layouts = dict()
+
+
+def _node_layout(node_type):
+    layout = _node_layouts.get(node_type)
+    if layout is None:
+        layout = _node_layouts[node_type] = node_type._fields + node_type._attributes
+    return layout
+
+
+def _constant_key(value):
+    # Constants that compare equal, such as 1, 1.0 and True, or 0.0 and -0.0, compile to different code.
+    value_type = type(value)
+    if value_type is float or value_type is complex:
+        return value_type, repr(value)
+    elif value_type is tuple or value_type is frozenset:
+        return value_type, tuple(map(_constant_key, value))
+    else:
+        return value_type, value
+
+
+def fingerprint(node):
+    """
+    Computes a hashable, canonical representation of the structure of a syntax tree, including node positions, without
+    building an ast.dump string.  Two trees have equal fingerprints if and only if they compile to equivalent code, so
+    fingerprints can be used directly as dictionary keys.
+    """
+    if isinstance(node, ast.AST):
+        node_type = type(node)
+        if node_type is ast.Constant:
+            return node_type, _constant_key(node.value), node.kind, node.lineno, node.col_offset, \
+                getattr(node, 'end_lineno', None), getattr(node, 'end_col_offset', None)
+        return (node_type,) + tuple([fingerprint(getattr(node, field, None)) for field in _node_layout(node_type)])
+    elif isinstance(node, list):
+        return tuple([fingerprint(child) for child in node])
+    else:
+        return node
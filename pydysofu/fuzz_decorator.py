@@ -3,9 +3,11 @@
 @author twsswt
 """
 
-from .core_fuzzers import identity
+import inspect
 
-from .fuzz_weaver import fuzz_function
+from .core_fuzzers import identity, is_identity, simplify
+
+from .fuzz_weaver import fuzz_function, fuzzed_function, prepare_fuzzed_function, restore_function, sampled
 
 
 # noinspection PyPep8Naming
@@ -14,25 +16,62 @@ class fuzz(object):
     A general purpose decorator for applying fuzzings to functions containing workflow steps.
 
     Attributes:
-    enable_fuzzings is by default set to False, but can be set to false to globally disable fuzzing.
+    enable_fuzzings is by default set to False, but can be set to false to globally disable fuzzing.  It is checked
+    on each invocation, so fuzzing can be enabled after functions have been decorated.  Functions decorated with an
+    identity fuzzer, or a sampling rate of 0, are returned undecorated, so that they incur no overhead.  Each
+    invocation of a decorated coroutine function awaits its own mutant, which is prepared without blocking the event
+    loop.
     """
 
     enable_fuzzings = True
 
-    def __init__(self, fuzzer=identity):
-        self.fuzzer = fuzzer
+    def __init__(self, fuzzer=identity, thread_safe=False, sampling_rate=1.0, **fuzzing_options):
+        """
+        :param thread_safe: if True, each invocation of the decorated function executes its own mutant via a new
+        function object, rather than replacing the decorated function's code object.
+        :param sampling_rate: the probability that an invocation of the decorated function is fuzzed.  Invocations that
+        are not fuzzed execute the decorated function's original code.
+        :param fuzzing_options: the keyword options accepted by fuzz_weaver.mutant_code.
+        """
+        self.fuzzer = simplify(fuzzer)
+        self.thread_safe = thread_safe
+        self.sampling_rate = sampling_rate
+        self.fuzzing_options = fuzzing_options
         self._original_syntax_tree = None
 
     def __call__(self, func):
 
+        if is_identity(self.fuzzer) or self.sampling_rate <= 0:
+            return func
+
+        if inspect.iscoroutinefunction(func):
+            return self.wrap_coroutine_function(func)
+
         def wrap(*args, **kwargs):
 
-            if not fuzz.enable_fuzzings:
+            if not fuzz.enable_fuzzings or not sampled(self.sampling_rate):
+                restore_function(func)
                 return func(*args, **kwargs)
 
-            fuzz_function(func, self.fuzzer)
+            if self.thread_safe:
+                return fuzzed_function(func, self.fuzzer, **self.fuzzing_options)(*args, **kwargs)
+
+            fuzz_function(func, self.fuzzer, **self.fuzzing_options)
 
             # Execute the mutated function.
             return func(*args, **kwargs)
 
         return wrap
+
+    def wrap_coroutine_function(self, func):
+
+        async def wrap(*args, **kwargs):
+
+            if not fuzz.enable_fuzzings or not sampled(self.sampling_rate):
+                restore_function(func)
+                return await func(*args, **kwargs)
+
+            function = await prepare_fuzzed_function(func, self.fuzzer, **self.fuzzing_options)
+            return await function(*args, **kwargs)
+
+        return wrap
@@ -3,81 +3,441 @@ Core fuzzing functionality.
 @author twsswt
 """
 import ast
+import asyncio
+import contextvars
 import copy
+import functools
 import inspect
+import os
+import types
 
-from .core_fuzzers import identity
+from threading import local
 
-from .workflow_transformer import WorkflowTransformer
+from .config import current_random
+
+from .core_fuzzers import identity, is_identity, recording_decisions, simplify
+
+from .fuzzer_trace import traced_call
+
+from .fuzzing_events import CACHE_HIT, METHOD_EXECUTED, MUTANT_BUILT, publish_event, publishing, \
+    published_on_completion
+
+from .mutant_cache import MutantCodeTable
+
+from .stage_timings import timed_fuzzer, timed_stage
+
+from .step_fragments import StepFragments
+
+from .syntax_tree_cache import SyntaxTreeCache
+
+from .workflow_transformer import TargetedWorkflowTransformer, WorkflowTransformer
 
 from asp import weave_clazz, weave_module, unweave_class, unweave_all_classes, IdentityAspect
 
 _reference_syntax_trees = dict()
 
+_step_fragments = dict()
 
-def get_reference_syntax_tree(func):
-    if func not in _reference_syntax_trees:
+_targeted_transformers = dict()
+
+_original_code = dict()
+
+compiled_mutants = MutantCodeTable()
+
+syntax_tree_cache = None
+
+
+def use_syntax_tree_cache(directory):
+    """
+    Enables persistent caching of reference syntax trees in the directory, so that processes started later can skip
+    retrieving and parsing the source of functions they fuzz.
+    :param directory: the cache directory, created if necessary, or None to disable the cache.
+    """
+    global syntax_tree_cache
+    syntax_tree_cache = None if directory is None else SyntaxTreeCache(directory)
+
+
+def _parse_reference_syntax_tree(func):
+    with timed_stage('source', func):
         func_source_lines = inspect.getsourcelines(func)[0]
 
-        global_indentation = len(func_source_lines[0]) - len(func_source_lines[0].strip())
-        for i in range(len(func_source_lines)):
-            func_source_lines[i] = func_source_lines[i][global_indentation - 1:]
+    global_indentation = len(func_source_lines[0]) - len(func_source_lines[0].strip())
+    for i in range(len(func_source_lines)):
+        func_source_lines[i] = func_source_lines[i][global_indentation - 1:]
+
+    func_source = ''.join(func_source_lines)
+    with timed_stage('parse', func):
+        return ast.parse(func_source)
 
-        func_source = ''.join(func_source_lines)
-        _reference_syntax_trees[func] = ast.parse(func_source)
+
+def get_reference_syntax_tree(func):
+    if func not in _reference_syntax_trees:
+        tree_cache = syntax_tree_cache
+        if tree_cache is None:
+            _reference_syntax_trees[func] = _parse_reference_syntax_tree(func)
+        else:
+            source_path = os.path.abspath(func.__code__.co_filename)
+            key = (func.__qualname__, func.__code__.co_firstlineno)
+            reference_syntax_tree = tree_cache.load(source_path, key)
+            if reference_syntax_tree is None:
+                reference_syntax_tree = _parse_reference_syntax_tree(func)
+                tree_cache.store(source_path, key, reference_syntax_tree)
+            _reference_syntax_trees[func] = reference_syntax_tree
 
     return _reference_syntax_trees[func]
 
 
-def fuzz_function(reference_function, fuzzer=identity, context=None):
+def get_step_fragments(func):
+    if func not in _step_fragments:
+        _step_fragments[func] = StepFragments(get_reference_syntax_tree(func))
+
+    return _step_fragments[func]
+
+
+def get_targeted_transformer(func):
+    if func not in _targeted_transformers:
+        _targeted_transformers[func] = TargetedWorkflowTransformer(get_reference_syntax_tree(func))
+
+    return _targeted_transformers[func]
+
+
+def _function_code(compiled_module):
+    """
+    Extracts the code object of the (single) function defined in a compiled module.
+    """
+    for const in compiled_module.co_consts:
+        if inspect.iscode(const):
+            return const
+
+
+def _compile_mutant(fuzzed_syntax_tree, reference_function, code_table):
+    filename = inspect.getsourcefile(reference_function)
+    with timed_stage('compile', reference_function):
+        if code_table is None:
+            compiled_module = compile(fuzzed_syntax_tree, filename, 'exec')
+        else:
+            compiled_module = code_table.code_for(fuzzed_syntax_tree, filename)
+    return _function_code(compiled_module)
+
+
+def _fuzz_syntax_tree(reference_syntax_tree, fuzzer, context, copy_on_write, reference_function=None):
+    fuzzer = timed_fuzzer(fuzzer, reference_function)
+    if copy_on_write:
+        workflow_transformer = WorkflowTransformer(fuzzer=fuzzer, context=context, copy_on_write=True)
+        with timed_stage('transform', reference_function):
+            return workflow_transformer.visit(reference_syntax_tree)
+    else:
+        with timed_stage('copy', reference_function):
+            fuzzed_syntax_tree = copy.deepcopy(reference_syntax_tree)
+        workflow_transformer = WorkflowTransformer(fuzzer=fuzzer, context=context)
+        with timed_stage('transform', reference_function):
+            workflow_transformer.visit(fuzzed_syntax_tree)
+        return fuzzed_syntax_tree
+
+
+def mutant_code(reference_function, fuzzer=identity, context=None, mutant_cache=None, code_table=None,
+                copy_on_write=False, step_fragments=False, mutant_library=None, targeted=False, fuzz_nested=()):
+    """
+    Produces the code object of a mutant of the reference function by applying the fuzzer to the reference function's
+    syntax tree.
+    :param mutant_cache: an optional MutantCache.  If supplied, the decisions recorded by the fuzzer are used to
+    look up a previously compiled mutant, rather than compiling the fuzzed syntax tree again.  The decisions are only
+    known once the fuzzer has been applied, so the fuzzer is still applied on every call and a cache hit only saves the
+    compilation.  Combine the cache with copy_on_write to also avoid deep copying the reference syntax tree.  Only
+    fuzzers whose output is fully determined by their recorded decisions should be used with a cache.
+    :param code_table: an optional MutantCodeTable, such as compiled_mutants, used to avoid compiling structurally
+    identical mutants more than once.  Fingerprinting a fuzzed syntax tree costs more than compiling it, so a table
+    only pays for itself when compilation is unusually expensive; by default mutants are always compiled.
+    :param copy_on_write: if True, the reference syntax tree is not deep copied.  Only the nodes changed by the fuzzer
+    are copied and the fuzzed syntax tree shares all other nodes with the reference syntax tree.  Fuzzers must copy
+    steps before modifying them, as the core fuzzers do, to be used in this mode.
+    :param step_fragments: if True, and the reference function contains no nested function definitions, the fuzzer is
+    applied directly to the reference function's top level steps.  Mutants that only remove, duplicate, reorder or
+    replace steps with pass are then compiled once per distinct selection of steps.  The same restriction on modifying
+    steps as for copy_on_write applies.
+    :param mutant_library: an optional MutantLibrary.  If the library holds mutants of the reference function produced
+    by the fuzzer, one of them is chosen by weight and the fuzzer is not applied.
+    :param targeted: if True, the fuzzer is applied to the body of the reference function, located directly in the
+    reference syntax tree, rather than to every function body found by visiting the whole tree.  Nested function
+    definitions are not renamed.  The same restriction on modifying steps as for copy_on_write applies.
+    :param fuzz_nested: in targeted mode, a collection of the names of nested function definitions whose bodies are also
+    fuzzed, or True to fuzz all of them.  Nested definitions are fuzzed before the bodies that contain them.
+    """
+    if mutant_library is not None:
+        mutant_code = mutant_library.select(reference_function, fuzzer)
+        if mutant_code is not None:
+            publish_event(CACHE_HIT, reference_function, fuzzer, context)
+            return mutant_code
+
     reference_syntax_tree = get_reference_syntax_tree(reference_function)
 
-    fuzzed_syntax_tree = copy.deepcopy(reference_syntax_tree)
-    workflow_transformer = WorkflowTransformer(fuzzer=fuzzer, context=context)
-    workflow_transformer.visit(fuzzed_syntax_tree)
-    # Compile the newly mutated function into a module, extract the mutated function code object and replace the
-    # reference function's code object for this call.
-    compiled_module = compile(fuzzed_syntax_tree, inspect.getsourcefile(reference_function), 'exec')
+    if targeted and get_targeted_transformer(reference_function).target_path is not None:
+
+        def fuzz_syntax_tree():
+            with timed_stage('transform', reference_function):
+                return get_targeted_transformer(reference_function).transform(
+                    timed_fuzzer(fuzzer, reference_function), context, fuzz_nested)
+    else:
+
+        def fuzz_syntax_tree():
+            return _fuzz_syntax_tree(reference_syntax_tree, fuzzer, context, copy_on_write, reference_function)
+
+    # Step fragments do not fuzz nested function definitions, which is equivalent to targeted mode without fuzz_nested.
+    if step_fragments and (get_step_fragments(reference_function).eligible or targeted and not fuzz_nested):
+
+        def compile_mutant(fuzzed_syntax_tree):
+            return _compile_mutant(fuzzed_syntax_tree, reference_function, code_table)
+
+        mutant_code = get_step_fragments(reference_function).fuzz(
+            timed_fuzzer(fuzzer, reference_function), context, compile_mutant)
+
+    elif mutant_cache is None:
+        fuzzed_syntax_tree = fuzz_syntax_tree()
+        mutant_code = _compile_mutant(fuzzed_syntax_tree, reference_function, code_table)
+
+    else:
+        with recording_decisions() as decisions:
+            fuzzed_syntax_tree = fuzz_syntax_tree()
+
+        key = (reference_function, fuzzer, tuple(decisions))
+        mutant_code = mutant_cache.get(key)
+        if mutant_code is not None:
+            publish_event(CACHE_HIT, reference_function, fuzzer, context)
+            return mutant_code
+
+        mutant_code = _compile_mutant(fuzzed_syntax_tree, reference_function, code_table)
+        mutant_cache.put(key, mutant_code)
+
+    publish_event(MUTANT_BUILT, reference_function, fuzzer, context)
+    return mutant_code
 
-    reference_function.__code__ = compiled_module.co_consts[0]
+
+def edit_plan(reference_function, fuzzer=identity, context=None):
+    """
+    Applies the fuzzer to the top level steps of the reference function and describes the result as an edit plan,
+    which is small, hashable and serialisable, without compiling it.  The fuzzer must copy steps before modifying them,
+    as the core fuzzers do.
+    :return : the edit plan, see pydysofu.edit_plan.
+    """
+    return get_step_fragments(reference_function).edit_plan(fuzzer, context)
+
+
+def planned_mutant_code(reference_function, plan, code_table=None):
+    """
+    :return : the code object of the mutant of the reference function described by the edit plan.  Mutants are
+    compiled once per distinct plan.
+    """
+
+    def compile_mutant(fuzzed_syntax_tree):
+        return _compile_mutant(fuzzed_syntax_tree, reference_function, code_table)
+
+    return get_step_fragments(reference_function).code_for_plan(plan, compile_mutant)
+
+
+def fuzz_function(reference_function, fuzzer=identity, context=None, **fuzzing_options):
+    """
+    Replaces the reference function's code object with a mutant produced by applying the fuzzer to the reference
+    function's syntax tree.  Note that the mutant is then executed by every caller of the reference function, including
+    callers on other threads, until the function is fuzzed again.
+    :param fuzzing_options: the keyword options accepted by mutant_code.
+    """
+    _original_code.setdefault(reference_function, (reference_function, reference_function.__code__))
+
+    # Replace the reference function's code object with the mutated function's code object for this call.
+    with traced_call(reference_function):
+        reference_function.__code__ = mutant_code(reference_function, fuzzer, context, **fuzzing_options)
+
+
+def restore_function(reference_function):
+    """
+    Restores the original code object of a function fuzzed by fuzz_function.  The reference function may be given by
+    any object that compares equal to it, such as the woven attribute used as a key in fuzzing advice.
+    """
+    function, original_code = _original_code.get(reference_function, (None, None))
+    if function is not None and function.__code__ is not original_code:
+        function.__code__ = original_code
+
+
+def fuzzed_function(reference_function, fuzzer=identity, context=None, **fuzzing_options):
+    """
+    Creates a new function object that executes a mutant produced by applying the fuzzer to the reference function's
+    syntax tree.  The reference function itself is not modified, so concurrent invocations can each execute their own
+    mutant.
+    :param fuzzing_options: the keyword options accepted by mutant_code.
+    """
+    with traced_call(reference_function):
+        code = mutant_code(reference_function, fuzzer, context, **fuzzing_options)
+
+    function = types.FunctionType(
+        code,
+        reference_function.__globals__,
+        reference_function.__name__,
+        reference_function.__defaults__,
+        reference_function.__closure__)
+    function.__kwdefaults__ = reference_function.__kwdefaults__
+    return function
+
+
+async def prepare_fuzzed_function(
+        reference_function, fuzzer=identity, context=None, executor=None, **fuzzing_options):
+    """
+    Creates a new function object executing a mutant of the reference function, as fuzzed_function does, but prepares
+    the mutant in an executor, so that the event loop is not blocked while the fuzzer is applied and the mutant
+    compiled.  The fuzzer runs in the caller's context, so it draws on the caller's random stream.
+    :param executor: the executor used to prepare the mutant, or None for the event loop's default executor.
+    :return : the new function object.
+    """
+    prepare = functools.partial(fuzzed_function, reference_function, fuzzer, context, **fuzzing_options)
+    return await asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, prepare)
+
+
+def sampled(sampling_rate):
+    """
+    :return : True if a call fuzzed at the sampling rate should be fuzzed, drawing from current_random() only if the
+    sampling rate is less than 1.
+    """
+    return sampling_rate >= 1.0 or current_random().random() < sampling_rate
 
 
 class FuzzingAspect(IdentityAspect):
 
-    def __init__(self, fuzzing_advice):
-        self.fuzzing_advice = fuzzing_advice
+    def __init__(self, fuzzing_advice, thread_safe=False, sampling_rate=1.0, **fuzzing_options):
+        """
+        :param thread_safe: if True, each invocation of an advised method executes its own mutant via a new function
+        object, rather than replacing the code object of the method's function, which is shared between threads.
+        Coroutine functions are always fuzzed in this way, as their invocations interleave on an event loop, and their
+        mutants are prepared without blocking the event loop.
+        :param sampling_rate: the probability that a call of an advised method is fuzzed, either for all advised methods
+        or as a dictionary mapping advised methods to their sampling rates, which default to 1.  Whether a call is
+        fuzzed is decided once per call in the prelude, before the fuzzing pipeline is entered, and calls that are not
+        fuzzed execute the original code of the method.
+        :param fuzzing_options: the keyword options accepted by mutant_code.
+        """
+        self.fuzzing_advice = {
+            reference_function: simplify(fuzzer) for reference_function, fuzzer in fuzzing_advice.items()
+        }
+        self.thread_safe = thread_safe
+        self.sampling_rates = (
+            sampling_rate if isinstance(sampling_rate, dict) else dict.fromkeys(self.fuzzing_advice, sampling_rate))
+        self.fuzzing_options = fuzzing_options
+        # The sampling decision taken in the prelude of the current thread's call, which is consumed by around.
+        self._sampled_calls = local()
 
     def prelude(self, attribute, context, *args, **kwargs):
-        self.apply_fuzzing(attribute, context)
+        reference_function, advice_key = self.reference_function_and_advice_key(attribute)
 
-    def apply_fuzzing(self, attribute, context):
+        self._sampled_calls.sampled = sampled(self.sampling_rates.get(advice_key, 1.0))
+        if not self._sampled_calls.sampled:
+            restore_function(reference_function)
+        elif not self.thread_safe and not inspect.iscoroutinefunction(reference_function):
+            self.apply_fuzzing(attribute, context)
+
+    def take_sampling_decision(self):
+        sampled_call = getattr(self._sampled_calls, 'sampled', True)
+        self._sampled_calls.sampled = True
+        return sampled_call
+
+    def around(self, attribute, context, *args, **kwargs):
+        result = self.fuzzed_call(attribute, context, *args, **kwargs)
+
+        if publishing():
+            reference_function, fuzzer = self.reference_function_and_fuzzer(attribute)
+            if inspect.iscoroutinefunction(reference_function):
+                return published_on_completion(result, METHOD_EXECUTED, reference_function, fuzzer, context)
+            publish_event(METHOD_EXECUTED, reference_function, fuzzer, context)
+
+        return result
+
+    def fuzzed_call(self, attribute, context, *args, **kwargs):
+        if not self.take_sampling_decision():
+            return attribute(*args, **kwargs)
+
+        reference_function, advice_key = self.reference_function_and_advice_key(attribute)
+
+        fuzzer = self.fuzzing_advice.get(advice_key, identity)
+
+        if inspect.iscoroutinefunction(reference_function):
+            if is_identity(fuzzer):
+                return attribute(*args, **kwargs)
+            return self.around_coroutine(attribute, reference_function, fuzzer, context, *args, **kwargs)
+
+        if not self.thread_safe:
+            return super(FuzzingAspect, self).around(attribute, context, *args, **kwargs)
+
+        if is_identity(fuzzer):
+            return attribute(*args, **kwargs)
+
+        function = fuzzed_function(reference_function, fuzzer, context, **self.fuzzing_options)
+
+        if inspect.ismethod(attribute):
+            return function(attribute.__self__, *args, **kwargs)
+        else:
+            return function(*args, **kwargs)
+
+    async def around_coroutine(self, attribute, reference_function, fuzzer, context, *args, **kwargs):
+        function = await prepare_fuzzed_function(reference_function, fuzzer, context, **self.fuzzing_options)
+
+        if inspect.ismethod(attribute):
+            return await function(attribute.__self__, *args, **kwargs)
+        else:
+            return await function(*args, **kwargs)
+
+    @staticmethod
+    def reference_function_and_advice_key(attribute):
         # Ensure that advice key is unbound method for instance methods.
         if inspect.ismethod(attribute):
-            reference_function = attribute.__func__
-            advice_key = getattr(attribute.__self__.__class__, attribute.__func__.__name__)
+            return attribute.__func__, getattr(attribute.__self__.__class__, attribute.__func__.__name__)
         else:
-            reference_function = attribute
-            advice_key = reference_function
+            return attribute, attribute
 
-        fuzzer = self.fuzzing_advice.get(advice_key, identity)
-        fuzz_function(reference_function, fuzzer, context)
+    def reference_function_and_fuzzer(self, attribute):
+        reference_function, advice_key = self.reference_function_and_advice_key(attribute)
+        return reference_function, self.fuzzing_advice.get(advice_key, identity)
 
+    def apply_fuzzing(self, attribute, context):
+        reference_function, fuzzer = self.reference_function_and_fuzzer(attribute)
+        if is_identity(fuzzer):
+            restore_function(reference_function)
+            return
 
-def fuzz_clazz(clazz, fuzzing_advice):
+        fuzz_function(reference_function, fuzzer, context, **self.fuzzing_options)
 
-    fuzzing_aspect = FuzzingAspect(fuzzing_advice)
 
-    advice = {k: fuzzing_aspect for k in fuzzing_advice.keys()}
+def fuzz_clazz(clazz, fuzzing_advice, thread_safe=False, sampling_rate=1.0, **fuzzing_options):
+    """
+    Weaves a FuzzingAspect into the advised methods of the class.  The advised fuzzers are simplified once, when woven.
+    Methods advised with fuzzers that simplify to identities, or sampled at a rate of 0, are not woven at all and
+    execute their original code.
+    :param sampling_rate: the probability that a call of an advised method is fuzzed, as accepted by FuzzingAspect.
+    :param fuzzing_options: the keyword options accepted by mutant_code.
+    """
+
+    fuzzing_aspect = FuzzingAspect(fuzzing_advice, thread_safe, sampling_rate, **fuzzing_options)
+
+    advice = dict()
+    for reference_function, fuzzer in fuzzing_aspect.fuzzing_advice.items():
+        if is_identity(fuzzer) or fuzzing_aspect.sampling_rates.get(reference_function, 1.0) <= 0:
+            restore_function(reference_function)
+        else:
+            advice[reference_function] = fuzzing_aspect
 
     weave_clazz(clazz, advice)
 
 
+def _restore_class(clazz):
+    for attribute in vars(clazz).values():
+        restore_function(getattr(attribute, '__func__', attribute))
+
+
 def defuzz_class(clazz):
     unweave_class(clazz)
+    _restore_class(clazz)
 
 
 def defuzz_all_classes():
     unweave_all_classes()
+    for reference_function in list(_original_code.keys()):
+        restore_function(reference_function)
 
 
 def fuzz_module(mod, advice):
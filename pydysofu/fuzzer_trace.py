@@ -0,0 +1,269 @@
+"""
+Opt in tracing of fuzzer applications, recording which fuzzer was applied, to which method, for which context, at which
+call number of the method and to which region of steps.
+
+Events are recorded in a TraceRecorder, a ring buffer of fixed capacity that stores each field of an event in its own
+array, with fuzzers, methods and workflow classes interned as integer identifiers.  Once the recorder is full, each new
+event overwrites the oldest, so memory use is bounded by the capacity however many events are recorded.
+@author twsswt
+"""
+
+import csv
+import json
+import struct
+
+from array import array
+from threading import Lock, local
+
+_recorder = None
+
+_traced_calls = local()
+
+_TRACE_MAGIC = b'PDSFTRC1'
+
+_HEADER = struct.Struct('<8sQQQ')
+
+# The name and array type code of each column of a trace.
+_COLUMNS = (
+    ('sequence', 'Q'),
+    ('call', 'Q'),
+    ('context', 'Q'),
+    ('fuzzer', 'I'),
+    ('method', 'I'),
+    ('workflow', 'I'),
+    ('region_start', 'i'),
+    ('region_end', 'i'),
+)
+
+_NO_REGION = (-1, -1)
+
+
+def _name(obj):
+    return '%s.%s' % (getattr(obj, '__module__', None), getattr(obj, '__qualname__', repr(obj)))
+
+
+class _Interner(object):
+    """
+    Assigns consecutive integer identifiers, from 1, to keys, recording a name for each.  Identifier 0 denotes no key.
+    """
+
+    __slots__ = ('identifiers', 'names')
+
+    def __init__(self):
+        self.identifiers = dict()
+        self.names = ['']
+
+    def intern(self, key, obj):
+        identifier = self.identifiers.get(key)
+        if identifier is None:
+            identifier = self.identifiers[key] = len(self.names)
+            self.names.append(_name(obj))
+        return identifier
+
+
+class TraceRecorder(object):
+    """
+    A ring buffer of fuzzer application events.  Each event occupies 44 bytes, so a recorder with the default capacity
+    of 2 ** 20 events uses about 44MB, in addition to the names of interned fuzzers, methods and workflows.
+
+    Fuzzers are interned by their code object, so fuzzers built afresh by the same factory on each call share an
+    identifier.  Contexts are recorded by their id().  Regions are the (start, end) indices of the steps selected by
+    the innermost enclosing filter_steps, relative to the steps that filter was applied to, or (-1, -1) if the fuzzer
+    was applied outside a filter.  Call numbers count the fuzzed calls of each method, from 1, while tracing.
+
+    Attributes:
+    recorded counts every event recorded, including those since overwritten.
+    """
+
+    __slots__ = (
+        'capacity', 'recorded', '_columns', '_fuzzers', '_methods', '_workflows', '_call_counts', '_lock') + tuple(
+        name for name, _ in _COLUMNS)
+
+    def __init__(self, capacity=2 ** 20):
+        self.capacity = capacity
+        self.recorded = 0
+        for name, type_code in _COLUMNS:
+            setattr(self, name, array(type_code, bytes(array(type_code).itemsize * capacity)))
+        self._columns = tuple(getattr(self, name) for name, _ in _COLUMNS)
+        self._fuzzers = _Interner()
+        self._methods = _Interner()
+        self._workflows = _Interner()
+        self._call_counts = dict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return min(self.recorded, self.capacity)
+
+    @property
+    def dropped(self):
+        """
+        :return : the number of events overwritten since the recorder was created or cleared.
+        """
+        return max(0, self.recorded - self.capacity)
+
+    def next_call(self, method):
+        with self._lock:
+            call = self._call_counts[method] = self._call_counts.get(method, 0) + 1
+            return self._methods.intern(method, method), call
+
+    def record(self, fuzzer, context, method=0, call=0, region=_NO_REGION):
+        """
+        Records the application of the fuzzer to steps of the interned method for the context.
+        """
+        workflow = context.__class__
+        with self._lock:
+            index = self.recorded % self.capacity
+            self.sequence[index] = self.recorded
+            self.call[index] = call
+            self.context[index] = id(context)
+            self.fuzzer[index] = self._fuzzers.intern(getattr(fuzzer, '__code__', fuzzer), fuzzer)
+            self.method[index] = method
+            self.workflow[index] = self._workflows.intern(workflow, workflow)
+            self.region_start[index], self.region_end[index] = region
+            self.recorded += 1
+
+    def clear(self):
+        with self._lock:
+            self.recorded = 0
+            self._call_counts.clear()
+
+    def _ordered_columns(self):
+        """
+        :return : copies of the columns, with the recorded events in the order they were recorded.
+        """
+        count = len(self)
+        start = self.recorded % self.capacity if self.recorded > self.capacity else 0
+        return [column[start:count] + column[:start] for column in self._columns]
+
+    def _names(self):
+        return {
+            'fuzzer': list(self._fuzzers.names),
+            'method': list(self._methods.names),
+            'workflow': list(self._workflows.names)
+        }
+
+    def events(self):
+        """
+        :return : an iterator over the recorded events, oldest first, as tuples of (sequence, call, context, fuzzer
+        name, method name, workflow name, region start, region end).
+        """
+        with self._lock:
+            columns = self._ordered_columns()
+            names = self._names()
+
+        for sequence, call, context, fuzzer, method, workflow, region_start, region_end in zip(*columns):
+            yield (sequence, call, context, names['fuzzer'][fuzzer], names['method'][method],
+                   names['workflow'][workflow], region_start, region_end)
+
+    def save(self, path):
+        """
+        Writes the recorded events to a compact binary file: a header, the interned names as JSON, and each column as a
+        packed array.
+        """
+        with self._lock:
+            columns = self._ordered_columns()
+            names = json.dumps(self._names()).encode('utf-8')
+            recorded = self.recorded
+
+        with open(path, 'wb') as trace_file:
+            trace_file.write(_HEADER.pack(_TRACE_MAGIC, len(columns[0]), recorded, len(names)))
+            trace_file.write(names)
+            for column in columns:
+                column.tofile(trace_file)
+
+    @staticmethod
+    def load(path):
+        """
+        :return : a dictionary mapping each column name to an array of the events saved at the path, together with
+        'names', which maps 'fuzzer', 'method' and 'workflow' to the lists of interned names indexed by those columns,
+        and 'recorded', the number of events recorded including those overwritten before the trace was saved.
+        """
+        with open(path, 'rb') as trace_file:
+            magic, count, recorded, names_length = _HEADER.unpack(trace_file.read(_HEADER.size))
+            if magic != _TRACE_MAGIC:
+                raise ValueError('%s is not a fuzzer trace' % path)
+
+            trace = {'names': json.loads(trace_file.read(names_length).decode('utf-8')), 'recorded': recorded}
+            for name, type_code in _COLUMNS:
+                column = array(type_code)
+                column.fromfile(trace_file, count)
+                trace[name] = column
+            return trace
+
+    def export_csv(self, path):
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(name for name, _ in _COLUMNS)
+            writer.writerows(self.events())
+
+
+def set_trace_recorder(recorder):
+    """
+    Records fuzzer applications in the recorder, or stops tracing if the recorder is None.
+    :return : the previous recorder.
+    """
+    global _recorder
+    previous, _recorder = _recorder, recorder
+    return previous
+
+
+def trace_recorder():
+    return _recorder
+
+
+class _TracedCall(object):
+
+    __slots__ = ('reference_function', 'enclosing')
+
+    def __init__(self, reference_function):
+        self.reference_function = reference_function
+
+    def __enter__(self):
+        self.enclosing = getattr(_traced_calls, 'call', None)
+        _traced_calls.call = _recorder.next_call(self.reference_function)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _traced_calls.call = self.enclosing
+
+
+class _UntracedCall(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_untraced_call = _UntracedCall()
+
+
+def traced_call(reference_function):
+    """
+    :return : a context manager within which fuzzer applications on the current thread are attributed to a new call of
+    the reference function, or a shared context manager that does nothing if tracing is disabled.
+    """
+    return _TracedCall(reference_function) if _recorder is not None else _untraced_call
+
+
+def traced_region(fuzzer, steps, context, start, end):
+    """
+    Applies the fuzzer to the steps, attributing the fuzzer applications it records to the region of steps.
+    """
+    enclosing = getattr(_traced_calls, 'region', _NO_REGION)
+    _traced_calls.region = (start, end)
+    try:
+        return fuzzer(steps, context)
+    finally:
+        _traced_calls.region = enclosing
+
+
+def record_application(fuzzer, context):
+    """
+    Records the application of the fuzzer for the context in the current recorder, if tracing is enabled.
+    """
+    recorder = _recorder
+    if recorder is not None:
+        method, call = getattr(_traced_calls, 'call', None) or (0, 0)
+        recorder.record(fuzzer, context, method, call, getattr(_traced_calls, 'region', _NO_REGION))
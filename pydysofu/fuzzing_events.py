@@ -0,0 +1,259 @@
+"""
+A subscription mechanism that streams fuzzing events to consumers in other threads or asyncio tasks, in the order
+they occurred.
+
+The events published are:
+ * mutant_built: a mutant of a method was produced by applying its fuzzer.
+ * cache_hit: a mutant of a method was taken from a MutantCache or MutantLibrary, without applying its fuzzer.
+ * fuzzer_applied: an atomic fuzzer was applied to the steps of a workflow.
+ * method_executed: a method woven by fuzz_clazz returned.
+
+Publishers append events to a bounded queue per subscription under the subscription's lock, and wake consumers
+waiting in other threads directly and asyncio consumers through their event loops.  When there are no subscriptions,
+publishing an event costs a single check.
+@author twsswt
+"""
+
+import asyncio
+
+from collections import deque, namedtuple
+from threading import Condition, Lock, get_ident
+from time import time
+
+MUTANT_BUILT = 'mutant_built'
+CACHE_HIT = 'cache_hit'
+FUZZER_APPLIED = 'fuzzer_applied'
+METHOD_EXECUTED = 'method_executed'
+
+EVENT_KINDS = frozenset({MUTANT_BUILT, CACHE_HIT, FUZZER_APPLIED, METHOD_EXECUTED})
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+
+FuzzingEvent = namedtuple('FuzzingEvent', ('kind', 'method', 'fuzzer', 'context', 'thread', 'time'))
+
+_subscriptions = ()
+
+_subscriptions_lock = Lock()
+
+
+class Subscription(object):
+    """
+    A bounded queue of the fuzzing events of the subscribed kinds.  When the queue is full, the overflow policy either
+    discards the oldest queued event (drop_oldest), discards the new event (drop_newest) or blocks the publishing thread
+    until the consumer makes space (block).  Note that a blocking subscription stalls the fuzzed workflows until its
+    consumer catches up.
+
+    Events are consumed one at a time with get, in batches with get_batch or batches, by iterating over the
+    subscription, or in batches by asynchronous iteration.  Iteration ends once the subscription is closed and its
+    queue is drained.
+
+    Attributes:
+    dropped counts the events discarded by the overflow policy.
+    """
+
+    def __init__(self, kinds=EVENT_KINDS, max_size=1024, overflow=DROP_OLDEST):
+        if overflow not in {DROP_OLDEST, DROP_NEWEST, BLOCK}:
+            raise ValueError('unknown overflow policy %r' % (overflow,))
+
+        self.kinds = frozenset(kinds)
+        self.max_size = max_size
+        self.overflow = overflow
+        self.dropped = 0
+        self.closed = False
+
+        self._events = deque(maxlen=max_size if overflow == DROP_OLDEST else None)
+        self._condition = Condition()
+        self._waiting_consumers = 0
+        self._waiting_publishers = 0
+        # (event loop, future) pairs of the asyncio consumers waiting for events.
+        self._async_waiters = list()
+
+    def __len__(self):
+        return len(self._events)
+
+    def put(self, event):
+        with self._condition:
+            events = self._events
+
+            if len(events) >= self.max_size:
+                if self.overflow == DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                elif self.overflow == BLOCK:
+                    self._waiting_publishers += 1
+                    try:
+                        self._condition.wait_for(lambda: len(events) < self.max_size or self.closed)
+                    finally:
+                        self._waiting_publishers -= 1
+                else:
+                    self.dropped += 1
+
+            events.append(event)
+
+            if self._waiting_consumers:
+                self._condition.notify_all()
+            async_waiters = self._take_async_waiters()
+
+        _wake_async_waiters(async_waiters)
+
+    def _take_async_waiters(self):
+        async_waiters = self._async_waiters
+        if async_waiters:
+            self._async_waiters = list()
+        return async_waiters
+
+    def _take_batch(self, limit):
+        events = self._events
+        batch = list()
+        while events and len(batch) < limit:
+            batch.append(events.popleft())
+
+        if batch and self._waiting_publishers:
+            self._condition.notify_all()
+        return batch
+
+    def get_batch(self, max_events=None, timeout=None):
+        """
+        Waits until at least one event is queued, the timeout expires or the subscription is closed.
+        :param max_events: the maximum number of events returned, by default the queue's maximum size.
+        :return : a list of the oldest queued events, which is empty if the timeout expired or the subscription is
+        closed and drained.
+        """
+        with self._condition:
+            if not self._events and not self.closed:
+                self._waiting_consumers += 1
+                try:
+                    self._condition.wait_for(lambda: self._events or self.closed, timeout)
+                finally:
+                    self._waiting_consumers -= 1
+
+            return self._take_batch(self.max_size if max_events is None else max_events)
+
+    def get(self, timeout=None):
+        """
+        :return : the oldest queued event, or None if the timeout expired or the subscription is closed and drained.
+        """
+        batch = self.get_batch(1, timeout)
+        return batch[0] if batch else None
+
+    def batches(self, max_events=None):
+        """
+        :return : a generator of the batches of events consumed by successive calls to get_batch.
+        """
+        while True:
+            batch = self.get_batch(max_events)
+            if not batch:
+                return
+            yield batch
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # Consumers wait on a future resolved through their event loop by the publishing thread, rather than in an
+        # executor thread, so waiting consumers can be cancelled and do not occupy the loop's default executor.
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                batch = self._take_batch(self.max_size)
+                if batch:
+                    return batch
+                elif self.closed:
+                    raise StopAsyncIteration
+
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+
+            try:
+                await waiter[1]
+            finally:
+                with self._condition:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    def close(self):
+        """
+        Unsubscribes and wakes any waiting consumers and publishers.  Events already queued can still be consumed.
+        """
+        unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+            async_waiters = self._take_async_waiters()
+
+        _wake_async_waiters(async_waiters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _wake_async_waiters(async_waiters):
+    for loop, future in async_waiters:
+        try:
+            loop.call_soon_threadsafe(_resolve, future)
+        except RuntimeError:
+            # The consumer's event loop has been closed.
+            pass
+
+
+def subscribe(kinds=EVENT_KINDS, max_size=1024, overflow=DROP_OLDEST):
+    """
+    :param kinds: the kinds of event delivered to the subscription, by default all kinds.
+    :param max_size: the maximum number of events queued for the subscription.
+    :param overflow: the policy applied to events published when the queue is full, drop_oldest, drop_newest or block.
+    :return : a new Subscription, which receives events until it is closed.
+    """
+    global _subscriptions
+    subscription = Subscription(kinds, max_size, overflow)
+    with _subscriptions_lock:
+        _subscriptions = _subscriptions + (subscription,)
+    return subscription
+
+
+def unsubscribe(subscription):
+    global _subscriptions
+    with _subscriptions_lock:
+        _subscriptions = tuple(s for s in _subscriptions if s is not subscription)
+
+
+def publishing():
+    """
+    :return : True if there are subscriptions to fuzzing events.
+    """
+    return bool(_subscriptions)
+
+
+def publish_event(kind, method=None, fuzzer=None, context=None):
+    """
+    Delivers an event to each subscription to events of its kind.
+    """
+    subscriptions = _subscriptions
+    if subscriptions:
+        event = FuzzingEvent(kind, method, fuzzer, context, get_ident(), time())
+        for subscription in subscriptions:
+            if kind in subscription.kinds:
+                subscription.put(event)
+
+
+async def published_on_completion(coroutine, kind, method=None, fuzzer=None, context=None):
+    """
+    Awaits the coroutine and publishes an event once it returns.
+    :return : the coroutine's result.
+    """
+    result = await coroutine
+    publish_event(kind, method, fuzzer, context)
+    return result
@@ -0,0 +1,89 @@
+"""
+Caching of compiled mutant code objects, so that repeated fuzzing decisions do not pay for a fresh compilation.
+@author twsswt
+"""
+
+from collections import OrderedDict
+
+from threading import Lock
+
+from .fingerprint import fingerprint
+
+
+class MutantCache(object):
+    """
+    A bounded, least recently used cache of compiled mutant code objects.  Keys are supplied by the weaver and take the
+    form (reference function, fuzzer, recorded fuzzer decisions), so a fuzzer that repeats an earlier decision reuses
+    the code object compiled for it.  The decisions are recorded by applying the fuzzer, so the cache saves the
+    compilation of a mutant, not the application of its fuzzer.
+
+    Attributes:
+    hits, misses and evictions count cache lookups that succeeded, lookups that failed and entries discarded to respect
+    max_size respectively.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+
+        self._code_objects = OrderedDict()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._code_objects)
+
+    def get(self, key):
+        """
+        :return : the code object cached against the key, or None if there is no such entry.
+        """
+        with self._lock:
+            code = self._code_objects.get(key)
+            if code is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._code_objects.move_to_end(key)
+            return code
+
+    def put(self, key, code):
+        with self._lock:
+            self._code_objects[key] = code
+            self._code_objects.move_to_end(key)
+            while len(self._code_objects) > self.max_size:
+                self._code_objects.popitem(last=False)
+                self.evictions += 1
+
+    def statistics(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self)}
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        with self._lock:
+            self._code_objects.clear()
+        self.reset_counters()
+
+
+class MutantCodeTable(MutantCache):
+    """
+    A content addressed table of compiled mutant code objects, keyed by the structural fingerprint of the fuzzed syntax
+    tree.  Identical mutants are compiled once, regardless of the fuzzer or decisions that produced them.
+    """
+
+    def code_for(self, syntax_tree, filename):
+        """
+        :return : the code object of the module compiled from the syntax tree, compiling it if no structurally identical
+        syntax tree has been compiled for the same file already.
+        """
+        key = (filename, fingerprint(syntax_tree))
+        code = self.get(key)
+        if code is None:
+            code = compile(syntax_tree, filename, 'exec')
+            self.put(key, code)
+        return code
@@ -0,0 +1,352 @@
+"""
+Ahead of time enumeration, compilation and storage of the mutants that a fuzzer can produce for a function, so that
+fuzzed workflows can execute precompiled mutants rather than transforming and compiling syntax trees on each call.
+
+A library is generated from the command line with:
+
+    python -m pydysofu.mutant_library LIBRARY MODULE:QUALIFIED_NAME FUZZER_EXPRESSION [MAX_MUTANTS]
+
+where FUZZER_EXPRESSION is evaluated in the namespace of pydysofu.core_fuzzers, for example 'remove_last_steps(1)'.
+@author twsswt
+"""
+
+import argparse
+import ast
+import copy
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import marshal
+import sys
+import types
+
+from random import Random
+from weakref import WeakKeyDictionary
+
+from .config import current_random, random_stream
+from .core_fuzzers import identity, simplify
+from .fingerprint import fingerprint
+from .fuzz_weaver import get_reference_syntax_tree, _compile_mutant, _fuzz_syntax_tree
+from .snippet_cache import Snippet
+
+_LIBRARY_FORMAT = 2
+
+_LITERAL_TYPES = (bool, int, float, complex, str, bytes, type(None))
+
+
+class UnenumerableFuzzerError(Exception):
+    """
+    Raised when a fuzzer draws on randomness that cannot be enumerated, such as continuous random numbers.
+    """
+
+
+class _ExploringRandom(Random):
+    """
+    A random number generator that replays a prefix of integer choices and chooses 0 for each subsequent draw,
+    recording the range of every draw.  Successive prefixes explore the tree of integer choices made by a fuzzer depth
+    first.
+    """
+
+    def __init__(self, prefix):
+        Random.__init__(self, 0)
+        self.prefix = prefix
+        self.draws = list()
+
+    def _randbelow(self, n):
+        index = len(self.draws)
+        if index < len(self.prefix):
+            choice, expected_n = self.prefix[index]
+            if n != expected_n:
+                raise UnenumerableFuzzerError('fuzzer draws are not determined by its earlier draws')
+        else:
+            choice = 0
+        self.draws.append((choice, n))
+        return choice
+
+    def sample(self, population, k, **kwargs):
+        # Always use the pool based algorithm, as the set based algorithm repeats draws until they are distinct.
+        pool = list(population)
+        n = len(pool)
+        if not 0 <= k <= n:
+            raise ValueError('sample larger than population or is negative')
+        result = list()
+        for i in range(k):
+            j = self._randbelow(n - i)
+            result.append(pool[j])
+            pool[j] = pool[n - i - 1]
+        return result
+
+    def random(self):
+        raise UnenumerableFuzzerError('fuzzer draws continuous random numbers')
+
+    def getrandbits(self, k):
+        raise UnenumerableFuzzerError('fuzzer draws random bits')
+
+
+def _next_prefix(draws):
+    """
+    :return : the prefix of choices that explores the next branch after the given draws, or None if every branch has
+    been explored.
+    """
+    prefix = list(draws)
+    while prefix:
+        choice, n = prefix.pop()
+        if choice + 1 < n:
+            prefix.append((choice + 1, n))
+            return prefix
+    return None
+
+
+def enumerate_mutants(reference_function, fuzzer=identity, context=None, max_mutants=4096):
+    """
+    Enumerates every mutant the fuzzer can produce for the reference function by exploring each sequence of integer
+    choices the fuzzer can draw from current_random(), for example by sample, choice, shuffle or randint.  Each
+    sequence is explored with a copy of the fuzzer, so the fuzzer itself is not applied.
+    :param max_mutants: the maximum number of fuzzer applications explored, after which a ValueError is raised.
+    :return : a list of (code object, weight) pairs, one per structurally distinct mutant, where the weight of a mutant
+    is the probability that the fuzzer produces it.
+    :raises UnenumerableFuzzerError: if the fuzzer draws continuous random numbers, or if the fuzzer changes as it is
+    applied, as remove_last_steps does unless reapply is set, since the mutants of such a fuzzer depend on its earlier
+    applications.
+    """
+    reference_syntax_tree = get_reference_syntax_tree(reference_function)
+    fuzzer_key = _fuzzer_key(fuzzer)
+
+    mutants = dict()
+    prefix = list()
+    explored = 0
+
+    while prefix is not None:
+        explored += 1
+        if explored > max_mutants:
+            raise ValueError('fuzzer produces more than %d mutants' % max_mutants)
+
+        exploring_random = _ExploringRandom(prefix)
+        exploring_fuzzer = _copied_fuzzer(fuzzer)
+        with random_stream(exploring_random):
+            fuzzed_syntax_tree = _fuzz_syntax_tree(
+                reference_syntax_tree, exploring_fuzzer, context, False, reference_function)
+
+        if _fuzzer_key(exploring_fuzzer) != fuzzer_key:
+            raise UnenumerableFuzzerError('fuzzer changes as it is applied')
+
+        probability = 1.0
+        for _, n in exploring_random.draws:
+            probability /= n
+
+        key = fingerprint(fuzzed_syntax_tree)
+        if key in mutants:
+            code, weight = mutants[key]
+            mutants[key] = (code, weight + probability)
+        else:
+            mutants[key] = (_compile_mutant(fuzzed_syntax_tree, reference_function, None), probability)
+
+        prefix = _next_prefix(exploring_random.draws)
+
+    return list(mutants.values())
+
+
+def _function_key(reference_function):
+    return '%s:%s' % (reference_function.__module__, reference_function.__qualname__)
+
+
+def _structure(value, enclosing):
+    """
+    :return : a description of the value built from literals, which is the same for values constructed in the same way
+    in different processes.  Functions are described by their qualified names, byte code, constants, defaults and the
+    values of their closure variables, so that fuzzers built by the same factory from equal arguments have equal
+    descriptions.
+    """
+    if isinstance(value, _LITERAL_TYPES):
+        return value
+    elif isinstance(value, Snippet):
+        return 'snippet', value.source, value.mode
+    elif isinstance(value, ast.AST):
+        return 'ast', ast.dump(value)
+    elif inspect.isclass(value) or inspect.isbuiltin(value):
+        return '%s:%s' % (value.__module__, value.__qualname__)
+    elif id(value) in enclosing:
+        return 'recursive',
+
+    enclosing = enclosing | {id(value)}
+    if isinstance(value, (list, tuple)):
+        return tuple(_structure(item, enclosing) for item in value)
+    elif isinstance(value, (set, frozenset)):
+        return tuple(sorted(repr(_structure(item, enclosing)) for item in value))
+    elif isinstance(value, dict):
+        return tuple(sorted((repr(k), _structure(v, enclosing)) for k, v in value.items()))
+    elif inspect.isfunction(value):
+        code = value.__code__
+        return (
+            '%s:%s' % (value.__module__, value.__qualname__),
+            code.co_code,
+            tuple(_structure(const, enclosing) for const in code.co_consts if not inspect.iscode(const)),
+            _structure(value.__defaults__, enclosing),
+            tuple(_structure(cell.cell_contents, enclosing) for cell in value.__closure__ or ()))
+
+    value_type = '%s:%s' % (type(value).__module__, type(value).__qualname__)
+    if hasattr(value, '__dict__'):
+        return value_type, _structure(vars(value), enclosing)
+    else:
+        return value_type
+
+
+def _fuzzer_key(fuzzer):
+    return hashlib.sha1(repr(_structure(fuzzer, frozenset())).encode('utf-8')).hexdigest()
+
+
+def _copied_fuzzer(value, memo=None):
+    """
+    :return : a deep copy of the fuzzer, in which the functions it is built from are also copied, together with their
+    closure variables, as copy.deepcopy shares functions.
+    """
+    memo = dict() if memo is None else memo
+    if id(value) in memo:
+        return memo[id(value)]
+    elif isinstance(value, list):
+        copied = memo[id(value)] = list()
+        copied.extend(_copied_fuzzer(item, memo) for item in value)
+        return copied
+    elif isinstance(value, tuple):
+        return tuple(_copied_fuzzer(item, memo) for item in value)
+    elif isinstance(value, dict):
+        copied = memo[id(value)] = dict()
+        copied.update((key, _copied_fuzzer(item, memo)) for key, item in value.items())
+        return copied
+    elif not inspect.isfunction(value):
+        return copy.deepcopy(value, memo)
+
+    cells = tuple(types.CellType() for _ in value.__closure__ or ())
+    copied = memo[id(value)] = types.FunctionType(
+        value.__code__, value.__globals__, value.__name__, value.__defaults__, cells or None)
+    copied.__qualname__ = value.__qualname__
+    copied.__kwdefaults__ = value.__kwdefaults__
+    for cell, copied_cell in zip(value.__closure__ or (), cells):
+        copied_cell.cell_contents = _copied_fuzzer(cell.cell_contents, memo)
+    copied.__dict__.update(_copied_fuzzer(value.__dict__, memo))
+    return copied
+
+
+class MutantLibrary(object):
+    """
+    A collection of precompiled mutants of reference functions, each weighted by the probability that the fuzzer used
+    to generate it produces it.  A library is passed to fuzz_clazz or fuzz as the mutant_library option, after which
+    fuzzed functions in the library execute a precompiled mutant, chosen by weight, in place of applying their fuzzer.
+
+    Mutants are held against the reference function and the fuzzer that generated them, so a function fuzzed with a
+    different fuzzer applies its fuzzer as usual.  Fuzzers are identified by their structure: the qualified names of
+    the functions they are built from and the values of their closure variables, such as the arguments of the factory
+    that built them.
+    """
+
+    def __init__(self):
+        self._mutants = dict()
+        self._fuzzer_keys = WeakKeyDictionary()
+
+    def __len__(self):
+        return len(self._mutants)
+
+    def __contains__(self, reference_function):
+        function_key = _function_key(reference_function)
+        return any(key[0] == function_key for key in self._mutants)
+
+    def _key(self, reference_function, fuzzer):
+        # Fuzzers are identified once, when first used with the library.
+        try:
+            fuzzer_key = self._fuzzer_keys.get(fuzzer)
+            if fuzzer_key is None:
+                fuzzer_key = self._fuzzer_keys[fuzzer] = _fuzzer_key(fuzzer)
+        except TypeError:
+            fuzzer_key = _fuzzer_key(fuzzer)
+        return _function_key(reference_function), fuzzer_key
+
+    def add(self, reference_function, fuzzer=identity, context=None, max_mutants=4096):
+        """
+        Enumerates and compiles the mutants of the reference function produced by the fuzzer, replacing any mutants
+        held for the function already.
+        :return : the number of distinct mutants added.
+        :raises UnenumerableFuzzerError: if the fuzzer's mutants cannot be enumerated, see enumerate_mutants.
+        """
+        fuzzer = simplify(fuzzer)
+        key = self._key(reference_function, fuzzer)
+        mutants = enumerate_mutants(reference_function, fuzzer, context, max_mutants)
+        self._mutants[key] = (
+            tuple(m[0] for m in mutants), tuple(m[1] for m in mutants))
+        return len(mutants)
+
+    def mutants(self, reference_function, fuzzer=identity):
+        """
+        :return : the precompiled mutant code objects for the reference function produced by the fuzzer, or an empty
+        tuple.
+        """
+        return self._mutants.get(self._key(reference_function, simplify(fuzzer)), ((), ()))[0]
+
+    def select(self, reference_function, fuzzer=identity, index=None):
+        """
+        :param fuzzer: the (simplified) fuzzer the reference function is fuzzed with.
+        :param index: the index of the mutant to select, or None to choose a mutant by weight using current_random().
+        :return : the code object of the selected mutant of the reference function, or None if the library holds no
+        mutants of the function produced by the fuzzer.
+        """
+        code_objects, weights = self._mutants.get(self._key(reference_function, fuzzer), ((), ()))
+        if not code_objects:
+            return None
+        elif index is not None:
+            return code_objects[index]
+        else:
+            return current_random().choices(code_objects, weights)[0]
+
+    def save(self, path):
+        with open(path, 'wb') as library_file:
+            marshal.dump((_LIBRARY_FORMAT, importlib.util.MAGIC_NUMBER, self._mutants), library_file)
+
+    @staticmethod
+    def load(path):
+        """
+        :return : the library saved at the path.
+        :raises ValueError: if the library was saved in a different format or by a different version of Python.
+        """
+        with open(path, 'rb') as library_file:
+            library_format, magic_number, mutants = marshal.load(library_file)
+
+        if library_format != _LIBRARY_FORMAT or magic_number != importlib.util.MAGIC_NUMBER:
+            raise ValueError('mutant library %s was generated by an incompatible version' % path)
+
+        library = MutantLibrary()
+        library._mutants = mutants
+        return library
+
+
+def _resolve_function(qualified_function_name):
+    module_name, _, qualified_name = qualified_function_name.partition(':')
+    target = importlib.import_module(module_name)
+    for name in qualified_name.split('.'):
+        target = getattr(target, name)
+    return inspect.unwrap(target)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m pydysofu.mutant_library',
+                                     description='Enumerates and compiles the mutants of a function into a library.')
+    parser.add_argument('library', help='the library file, extended if it exists already')
+    parser.add_argument('function', help='the function to fuzz, as module:qualified.name')
+    parser.add_argument('fuzzer', help='a fuzzer expression evaluated in the namespace of pydysofu.core_fuzzers')
+    parser.add_argument('max_mutants', nargs='?', type=int, default=4096)
+    arguments = parser.parse_args(arguments)
+
+    try:
+        library = MutantLibrary.load(arguments.library)
+    except (OSError, EOFError):
+        library = MutantLibrary()
+
+    namespace = vars(importlib.import_module('pydysofu.core_fuzzers'))
+    fuzzer = eval(arguments.fuzzer, dict(namespace))
+    count = library.add(_resolve_function(arguments.function), fuzzer, max_mutants=arguments.max_mutants)
+    library.save(arguments.library)
+
+    print('%d mutants of %s written to %s' % (count, arguments.function, arguments.library))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+An interned cache of the syntax trees of code snippets supplied to fuzzers as strings, so that string driven fuzzers
+parse their snippets once, when they are constructed, rather than on every invocation.
+@author twsswt
+"""
+
+import ast
+
+_snippets = dict()
+
+
+class Snippet(object):
+    """
+    The parsed syntax tree of a code snippet.  The nodes of the syntax tree are shared by every fuzzed syntax tree the
+    snippet is inserted into while copy on write is active, and copied otherwise (see core_fuzzers.shareable).  A
+    snippet that cannot be parsed records its syntax error, which is raised when the snippet is used, so that fuzzers
+    constructed from bad snippets fail when they are applied, as they would if the snippet was parsed on each
+    invocation.
+    """
+
+    __slots__ = ('source', 'mode', 'syntax_tree', 'error')
+
+    def __init__(self, source, mode='exec'):
+        self.source = source
+        self.mode = mode
+        try:
+            self.syntax_tree = ast.parse(source, mode=mode)
+            self.error = None
+        except SyntaxError as e:
+            self.syntax_tree = None
+            self.error = e
+
+    def statements(self):
+        """
+        :return : a new list of the snippet's shared statement nodes.
+        :raises SyntaxError: if the snippet cannot be parsed.
+        """
+        if self.error is not None:
+            raise SyntaxError(*self.error.args)
+        return list(self.syntax_tree.body)
+
+    def expression(self):
+        """
+        :return : the snippet's shared expression node, for snippets parsed in eval mode.
+        :raises SyntaxError: if the snippet cannot be parsed.
+        """
+        if self.error is not None:
+            raise SyntaxError(*self.error.args)
+        return self.syntax_tree.body
+
+
+def snippet(source, mode='exec'):
+    """
+    :param mode: 'exec' for snippets of statements or 'eval' for expressions.
+    :return : the interned Snippet of the source, parsed on first use.
+    """
+    key = (source, mode)
+    parsed_snippet = _snippets.get(key)
+    if parsed_snippet is None:
+        parsed_snippet = _snippets.setdefault(key, Snippet(source, mode))
+    return parsed_snippet
+
+
+def clear_snippet_cache():
+    _snippets.clear()
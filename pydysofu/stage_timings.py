@@ -0,0 +1,154 @@
+"""
+Opt in timing of the stages of the fuzzing pipeline, recorded per stage and per reference function.
+
+The stages recorded are:
+ * source: retrieving the source of a reference function.
+ * parse: parsing the source of a reference function.
+ * copy: deep copying a reference syntax tree.
+ * transform: visiting a syntax tree with the WorkflowTransformer, including the time spent in the fuzzer.
+ * fuzzer: applying the fuzzer to a function body.
+ * compile: compiling a fuzzed syntax tree, including any lookup in a MutantCodeTable.
+@author twsswt
+"""
+
+from threading import Lock
+from time import perf_counter
+
+_enabled = False
+
+_lock = Lock()
+
+_timings = dict()
+
+
+class StageTiming(object):
+    """
+    The cumulative time spent in a stage, together with a histogram of the durations of the stage, bucketed by powers
+    of two microseconds.
+    """
+
+    __slots__ = ('count', 'total', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = dict()
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        bucket = int(seconds * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def histogram(self):
+        """
+        :return : a dictionary mapping the exclusive upper bound of each non-empty bucket, in microseconds, to the
+        number of durations recorded in the bucket.
+        """
+        return {2 ** bucket: count for bucket, count in sorted(self.buckets.items())}
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'histogram': self.histogram()
+        }
+
+
+class _StageTimer(object):
+
+    __slots__ = ('stage', 'reference_function', 'start')
+
+    def __init__(self, stage, reference_function):
+        self.stage = stage
+        self.reference_function = reference_function
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record_stage(self.stage, self.reference_function, perf_counter() - self.start)
+
+
+class _DisabledTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_disabled_timer = _DisabledTimer()
+
+
+def timed_stage(stage, reference_function):
+    """
+    :return : a context manager that records the time spent within it against the stage and reference function, or a
+    shared context manager that does nothing if stage timing is disabled.
+    """
+    return _StageTimer(stage, reference_function) if _enabled else _disabled_timer
+
+
+def timed_fuzzer(fuzzer, reference_function):
+    """
+    :return : the fuzzer, wrapped to record the time spent applying it if stage timing is enabled.
+    """
+    if not _enabled:
+        return fuzzer
+
+    def _timed_fuzzer(steps, context):
+        with _StageTimer('fuzzer', reference_function):
+            return fuzzer(steps, context)
+
+    return _timed_fuzzer
+
+
+def record_stage(stage, reference_function, seconds):
+    with _lock:
+        function_timings = _timings.setdefault(reference_function, dict())
+        stage_timing = function_timings.get(stage)
+        if stage_timing is None:
+            stage_timing = function_timings[stage] = StageTiming()
+        stage_timing.record(seconds)
+
+
+def enable_stage_timings(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def stage_timings_enabled():
+    return _enabled
+
+
+def stage_timings(reference_function=None):
+    """
+    :param reference_function: the reference function to report timings for, or None to report timings summed over all
+    reference functions.
+    :return : a dictionary mapping each recorded stage to a dictionary of the stage's count, total and mean time in
+    seconds and histogram of durations.
+    """
+    with _lock:
+        if reference_function is not None:
+            function_timings = _timings.get(reference_function, dict())
+            return {stage: timing.as_dict() for stage, timing in function_timings.items()}
+
+        totals = dict()
+        for function_timings in _timings.values():
+            for stage, timing in function_timings.items():
+                totals.setdefault(stage, StageTiming()).merge(timing)
+        return {stage: timing.as_dict() for stage, timing in totals.items()}
+
+
+def reset_stage_timings():
+    with _lock:
+        _timings.clear()
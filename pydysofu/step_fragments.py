@@ -0,0 +1,98 @@
+"""
+A fuzzing backend for structural fuzzers, which only remove, duplicate, reorder or replace with pass the top level steps
+of a workflow function.  The mutant produced by such a fuzzer is fully described by the selection of reference steps it
+returns, so each distinct selection is compiled only once, without copying or transforming the reference syntax tree.
+Mutants produced by other fuzzers are compiled once per distinct edit plan (see edit_plan).
+@author twsswt
+"""
+
+import ast
+import copy
+
+from .core_fuzzers import copying_on_write
+from .edit_plan import apply_edit_plan, derive_edit_plan
+from .mutant_cache import MutantCache
+
+
+class StepFragments(object):
+    """
+    The top level steps of a reference function's syntax tree, together with the code objects compiled for the
+    selections of those steps made by fuzzers.
+    """
+
+    def __init__(self, reference_syntax_tree, max_selections=1024):
+        self.reference_syntax_tree = reference_syntax_tree
+        self.function_def = reference_syntax_tree.body[0]
+        self.steps = self.function_def.body
+
+        self._step_indices = {id(step): index for index, step in enumerate(self.steps)}
+
+        # Fuzzers are also applied to the bodies of nested function definitions by the WorkflowTransformer, which this
+        # backend does not do.
+        self.eligible = not any(
+            type(node) in {ast.FunctionDef, ast.AsyncFunctionDef}
+            for step in self.steps for node in ast.walk(step))
+
+        self.selections = MutantCache(max_selections)
+
+    def selection(self, fuzzed_steps):
+        """
+        :return : a tuple containing the index of each of the fuzzed steps in the reference steps, or None for steps
+        that are pass statements inserted by the fuzzer.  None is returned instead if the fuzzed steps include other
+        steps that are not in the reference steps.
+        """
+        selection = list()
+        for step in fuzzed_steps:
+            index = self._step_indices.get(id(step))
+            if index is None and type(step) is not ast.Pass:
+                return None
+            selection.append(index)
+        return tuple(selection)
+
+    def fuzzed_syntax_tree(self, fuzzed_steps):
+        function_def = copy.copy(self.function_def)
+        function_def.name += '_mod'
+        function_def.decorator_list = []
+        function_def.body = fuzzed_steps
+
+        syntax_tree = copy.copy(self.reference_syntax_tree)
+        syntax_tree.body = [function_def]
+        return syntax_tree
+
+    def fuzz(self, fuzzer, context, compile_mutant):
+        """
+        Applies the fuzzer to a list of the reference steps and returns the code object of the resulting mutant.
+        :param compile_mutant: a function that compiles a fuzzed syntax tree into a function code object.  The function
+        is invoked when the fuzzer makes a selection, or other edit to the steps, that has not been compiled before.
+        """
+        with copying_on_write():
+            fuzzed_steps = fuzzer(list(self.steps), context)
+        key = self.selection(fuzzed_steps)
+
+        if key is None:
+            key = derive_edit_plan(self.steps, fuzzed_steps)
+
+        code = self.selections.get(key)
+        if code is None:
+            code = compile_mutant(self.fuzzed_syntax_tree(fuzzed_steps))
+            self.selections.put(key, code)
+        return code
+
+    def edit_plan(self, fuzzer, context):
+        """
+        :return : the edit plan describing the steps produced by applying the fuzzer to a list of the reference steps.
+        """
+        with copying_on_write():
+            fuzzed_steps = fuzzer(list(self.steps), context)
+        return derive_edit_plan(self.steps, fuzzed_steps)
+
+    def code_for_plan(self, plan, compile_mutant):
+        """
+        :return : the code object of the mutant described by the edit plan, compiling it if it has not been compiled
+        before.
+        """
+        code = self.selections.get(plan)
+        if code is None:
+            code = compile_mutant(self.fuzzed_syntax_tree(apply_edit_plan(self.steps, plan)))
+            self.selections.put(plan, code)
+        return code
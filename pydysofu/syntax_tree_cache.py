@@ -0,0 +1,110 @@
+"""
+Persistent storage of parsed reference syntax trees, so that new processes need not retrieve and parse the source of
+every fuzzed function again.
+@author twsswt
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+
+from threading import Lock
+
+
+class SyntaxTreeCache(object):
+    """
+    An on-disk cache of reference syntax trees.  Each tree is pickled to its own cache file in the cache directory,
+    named after the source file's path and the tree's key, together with the source file's path, modification time and
+    a hash of its content.  A cache file is ignored, and later overwritten, if the source file has changed since it was
+    written.  Trees are keyed within a source file by the function's qualified name and first line number.  Loading or
+    storing a tree therefore reads or writes only that tree, however many functions of the same source file are cached.
+
+    Attributes:
+    hits and misses count loads that found a valid cached tree and loads that did not respectively.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+        self._signatures = dict()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_path(self, source_path, key):
+        name = hashlib.sha1(repr((source_path, key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, '%s-py%d%d.pickle' % ((name,) + sys.version_info[:2]))
+
+    def _source_signature(self, source_path):
+        """
+        :return : the modification time and content hash of the source file, read the first time the source file is
+        seen.
+        """
+        signature = self._signatures.get(source_path)
+        if signature is None:
+            with open(source_path, 'rb') as source_file:
+                content = source_file.read()
+            signature = self._signatures[source_path] = (
+                os.stat(source_path).st_mtime_ns, hashlib.sha1(content).hexdigest())
+        return signature
+
+    def _read_entry(self, source_path, key):
+        try:
+            signature = self._source_signature(source_path)
+            with open(self._cache_path(source_path, key), 'rb') as cache_file:
+                entry = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError, TypeError):
+            return None
+
+        if (not isinstance(entry, dict) or entry.get('source_path') != source_path or entry.get('key') != key or
+                entry.get('signature') != signature):
+            return None
+
+        return entry
+
+    def load(self, source_path, key):
+        """
+        :return : the syntax tree cached against the key for the source file, or None if there is no such tree or the
+        source file has changed.
+        """
+        with self._lock:
+            entry = self._read_entry(source_path, key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry['syntax_tree']
+
+    def store(self, source_path, key, syntax_tree):
+        """
+        Caches the syntax tree against the key for the source file, writing the tree's cache file.  Failures to write
+        the cache file are ignored.
+        """
+        with self._lock:
+            cache_path = self._cache_path(source_path, key)
+            temporary_path = '%s.%d.tmp' % (cache_path, os.getpid())
+            try:
+                entry = {
+                    'source_path': source_path,
+                    'key': key,
+                    'signature': self._source_signature(source_path),
+                    'syntax_tree': syntax_tree
+                }
+                os.makedirs(self.directory, exist_ok=True)
+                with open(temporary_path, 'wb') as cache_file:
+                    pickle.dump(entry, cache_file, pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary_path, cache_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """
+        Discards the source file signatures held in memory.  Cache files are left in place.
+        """
+        with self._lock:
+            self._signatures.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,61 @@
+"""
+Weighted selection from large distributions of fuzzers.
+@author twsswt
+"""
+
+
+class CumulativeWeights(object):
+    """
+    The weights of a distribution, held in a binary indexed (Fenwick) tree of partial sums, so that a weight can be
+    changed, and the item reached by a cumulative weight found, in time logarithmic in the number of weights.
+    """
+
+    def __init__(self, weights):
+        self.weights = list(weights)
+
+        size = len(self.weights)
+        self._tree = [0.0] + self.weights
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                self._tree[parent] += self._tree[i]
+
+        self._top_step = 1 << (size.bit_length() - 1) if size else 0
+        self.total = float(sum(self.weights))
+
+    def __len__(self):
+        return len(self.weights)
+
+    def reweight(self, index, weight):
+        """
+        Changes the weight of the indexed item in place.
+        """
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        self.total += delta
+
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, cumulative_weight):
+        """
+        :return : the index of the first item at which the cumulative weight of the items up to and including it
+        reaches the given cumulative weight, or of the last item if no item does.  If every weight is zero, the first
+        item is found.
+        :raises ValueError: if there are no weights.
+        """
+        if not self.weights:
+            raise ValueError('cannot choose from an empty distribution')
+
+        position = 0
+        remaining = cumulative_weight
+        step = self._top_step
+        while step:
+            candidate = position + step
+            if candidate < len(self._tree) and self._tree[candidate] < remaining:
+                position = candidate
+                remaining -= self._tree[candidate]
+            step >>= 1
+        return min(position, len(self.weights) - 1)
@@ -3,16 +3,21 @@
 @author twsswt
 """
 import ast
+import copy
+
+from .core_fuzzers import copying_on_write
 
 
 class WorkflowTransformer(ast.NodeTransformer):
 
-    def __init__(self, fuzzer=lambda x: x, strip_decorators=True, context=None):
+    def __init__(self, fuzzer=lambda x: x, strip_decorators=True, context=None, copy_on_write=False):
         """
         :param fuzzer: a function that takes a list of strings (lines of program code) and returns another
         list of lines.
         :param strip_decorators: removing decorators prevents re-mutation if a function decorated with a mutator is
         called recursively.
+        :param copy_on_write: if True, the visited syntax tree is left unmodified.  Nodes on the path to a changed node
+        are copied and the transformed tree returned by visit shares all untouched sub-trees with the visited tree.
         """
 
         self.strip_decorators = strip_decorators
@@ -20,21 +25,175 @@ class WorkflowTransformer(ast.NodeTransformer):
 
         self.context = context
 
+        self.copy_on_write = copy_on_write
+
+    def _visit_fields(self, node):
+        """
+        Visits the children of the supplied node without modifying it.
+        :return : a dictionary of the node's fields whose values were changed by the visit, mapped to new values.
+        """
+        changes = dict()
+        for field, old_value in ast.iter_fields(node):
+            if isinstance(old_value, list):
+                new_values = list()
+                for value in old_value:
+                    if isinstance(value, ast.AST):
+                        value = self.visit(value)
+                        if value is None:
+                            continue
+                        elif not isinstance(value, ast.AST):
+                            new_values.extend(value)
+                            continue
+                    new_values.append(value)
+                if len(new_values) != len(old_value) or any(n is not o for n, o in zip(new_values, old_value)):
+                    changes[field] = new_values
+            elif isinstance(old_value, ast.AST):
+                new_node = self.visit(old_value)
+                if new_node is not old_value:
+                    changes[field] = new_node
+        return changes
+
+    def generic_visit(self, node):
+        if not self.copy_on_write:
+            return ast.NodeTransformer.generic_visit(self, node)
+
+        changes = self._visit_fields(node)
+        if changes:
+            node = copy.copy(node)
+            for field, value in changes.items():
+                setattr(node, field, value)
+        return node
+
     # noinspection PyPep8Naming
     def visit_FunctionDef(self, node):
         """
         Applies this visitor's mutation operator to the body of the supplied node.
         """
 
+        if self.copy_on_write:
+            node = copy.copy(node)
+
         # Renaming is necessary so that we don't overwrite Python's object caching.
         node.name += '_mod'
 
         if self.strip_decorators:
             node.decorator_list = []
 
-        # Perform visit before applying mutation, to avoid recursive mutations.
-        result = self.generic_visit(node)
+        if self.copy_on_write:
+            for field, value in self._visit_fields(node).items():
+                setattr(node, field, value)
+            result = node
+        else:
+            # Perform visit before applying mutation, to avoid recursive mutations.
+            result = self.generic_visit(node)
 
-        node.body = self.fuzzer(node.body, self.context)
+        if self.copy_on_write:
+            with copying_on_write():
+                node.body = self.fuzzer(list(node.body), self.context)
+        else:
+            node.body = self.fuzzer(node.body, self.context)
 
         return result
+
+    # noinspection PyPep8Naming
+    def visit_AsyncFunctionDef(self, node):
+        return self.visit_FunctionDef(node)
+
+
+def _function_definition_paths(node, path=()):
+    """
+    :return : a list of (function definition, path) pairs for the function definitions nested within the node, in post
+    order, so that nested definitions precede the definitions that contain them.  Each path is a tuple of (field, index)
+    pairs leading from the node to the definition, where index is None for fields that hold a single node.
+    """
+    result = list()
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, list):
+            children = [(child, (field, index)) for index, child in enumerate(value) if isinstance(child, ast.AST)]
+        elif isinstance(value, ast.AST):
+            children = [(value, (field, None))]
+        else:
+            children = []
+
+        for child, step in children:
+            result.extend(_function_definition_paths(child, path + (step,)))
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                result.append((child, path + (step,)))
+    return result
+
+
+def _replace_at(node, path, replace):
+    """
+    :return : a shallow copy of the node in which the descendant at the end of the path is replaced by the result of
+    applying the replace function to it.  Only the nodes on the path are copied.
+    """
+    if not path:
+        return replace(node)
+
+    (field, index), remaining_path = path[0], path[1:]
+    node = copy.copy(node)
+    value = getattr(node, field)
+    if index is None:
+        setattr(node, field, _replace_at(value, remaining_path, replace))
+    else:
+        value = list(value)
+        value[index] = _replace_at(value[index], remaining_path, replace)
+        setattr(node, field, value)
+    return node
+
+
+class TargetedWorkflowTransformer(object):
+    """
+    Applies fuzzers to the body of the first function defined in a reference syntax tree, located through a path
+    computed once, rather than by visiting the whole tree.  Function definitions nested within the target function are
+    only fuzzed if they are named in fuzz_nested, and are not renamed.  The reference syntax tree is not modified: only
+    the nodes on the paths to fuzzed bodies are copied, so fuzzers must copy steps before modifying them, as for the
+    copy on write mode of the WorkflowTransformer.
+    """
+
+    def __init__(self, reference_syntax_tree, strip_decorators=True):
+        self.reference_syntax_tree = reference_syntax_tree
+        self.strip_decorators = strip_decorators
+
+        self.target_path = None
+        self.nested_paths = list()
+
+        for function_def, path in _function_definition_paths(reference_syntax_tree):
+            if self.target_path is None or len(path) < len(self.target_path):
+                self.target_path = path
+
+        if self.target_path is not None:
+            target = self.reference_syntax_tree
+            for field, index in self.target_path:
+                target = getattr(target, field) if index is None else getattr(target, field)[index]
+            self.nested_paths = [(f.name, path) for f, path in _function_definition_paths(target)]
+
+    def transform(self, fuzzer, context=None, fuzz_nested=()):
+        """
+        :param fuzz_nested: a collection of the names of the nested function definitions whose bodies are also fuzzed,
+        or True to fuzz every nested function definition.
+        :return : the fuzzed syntax tree.
+        """
+
+        def fuzz_body(function_def):
+            function_def = copy.copy(function_def)
+            with copying_on_write():
+                function_def.body = fuzzer(list(function_def.body), context)
+            return function_def
+
+        def fuzz_target(function_def):
+            for name, path in self.nested_paths:
+                if fuzz_nested is True or name in fuzz_nested:
+                    function_def = _replace_at(function_def, path, fuzz_body)
+
+            function_def = fuzz_body(function_def)
+
+            # Renaming is necessary so that we don't overwrite Python's object caching.
+            function_def.name += '_mod'
+
+            if self.strip_decorators:
+                function_def.decorator_list = []
+
+            return function_def
+
+        return _replace_at(self.reference_syntax_tree, self.target_path, fuzz_target)
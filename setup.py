@@ -11,6 +11,7 @@ setup(
     author_email='twallisgm@gmail.com',
     description='Python Dynamic Source Fuzzing',
     setup_requires=['asp'],
+    extras_require={'batched': ['numpy']},
     test_suite='nose.collector',
     tests_require=['mock', 'nose']
 )
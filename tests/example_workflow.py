@@ -1,3 +1,11 @@
+import asyncio
+
+
+async def _async_range(start, stop):
+    for i in range(start, stop):
+        yield i
+
+
 class ExampleWorkflow(object):
     """
     An example workflow class containing functions that can be fuzzed for unit testing.
@@ -56,6 +64,24 @@ class ExampleWorkflow(object):
         for i in range(1, 3):
             self.environment.append(i)
 
+    def method_containing_nested_function(self):
+        def record(value):
+            self.environment.append(value)
+            self.environment.append(value * 10)
+        record(1)
+        self.environment.append(2)
+
+    async def async_method_for_fuzzing(self):
+        self.environment.append(1)
+        await asyncio.sleep(0)
+        self.environment.append(2)
+        self.environment.append(3)
+
+    async def async_method_containing_async_for(self):
+        async for i in _async_range(1, 4):
+            self.environment.append(i)
+            self.environment.append(i * 10)
+
     @staticmethod
     def example_class_method():
         return 1
@@ -0,0 +1,109 @@
+import asyncio
+
+import unittest
+
+from mock import Mock
+
+import pydysofu as fm
+
+from pydysofu.config import random_stream, CounterRandom
+from pydysofu.core_fuzzers import *
+
+from example_workflow import ExampleWorkflow
+
+
+class AsyncWorkflow(object):
+
+    def __init__(self, environment):
+        self.environment = environment
+
+    @fm.fuzz(remove_last_step)
+    async def decorated_remove_last_step(self):
+        self.environment.append(1)
+        await asyncio.sleep(0)
+        self.environment.append(2)
+        self.environment.append(3)
+
+    @fm.fuzz(identity)
+    async def decorated_identity(self):
+        self.environment.append(1)
+        self.environment.append(2)
+
+
+class AsyncFuzzingTest(unittest.TestCase):
+
+    def setUp(self):
+        fm.defuzz_all_classes()
+        self.environment = list()
+        self.target = ExampleWorkflow(self.environment)
+
+    def tearDown(self):
+        fm.defuzz_all_classes()
+
+    def test_decorated_coroutine_function(self):
+        asyncio.run(AsyncWorkflow(self.environment).decorated_remove_last_step())
+
+        self.assertEqual([1, 2], self.environment)
+
+    def test_identity_decorated_coroutine_function_is_undecorated(self):
+        self.assertTrue(asyncio.iscoroutinefunction(AsyncWorkflow.decorated_identity))
+        asyncio.run(AsyncWorkflow(self.environment).decorated_identity())
+
+        self.assertEqual([1, 2], self.environment)
+
+    def test_fuzz_clazz_coroutine_method(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.async_method_for_fuzzing: remove_last_step})
+
+        asyncio.run(self.target.async_method_for_fuzzing())
+
+        self.assertEqual([1, 2], self.environment)
+
+    def test_concurrent_coroutines_execute_own_mutants(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.async_method_for_fuzzing: remove_random_step})
+
+        environments = [list() for _ in range(21)]
+
+        async def run_agent(index, environment):
+            # Each agent removes a different one of the first three steps: the first append, the sleep or the second
+            # append.
+            with random_stream(Mock(sample=Mock(return_value=[index % 3]))):
+                await ExampleWorkflow(environment).async_method_for_fuzzing()
+
+        async def run_agents():
+            await asyncio.gather(*(run_agent(i, e) for i, e in enumerate(environments)))
+
+        asyncio.run(run_agents())
+
+        expected_environments = [[2, 3], [1, 2, 3], [1, 3]]
+        for index, environment in enumerate(environments):
+            self.assertEqual(expected_environments[index % 3], environment)
+
+    def test_recurse_into_async_for(self):
+        fm.fuzz_clazz(
+            ExampleWorkflow,
+            {ExampleWorkflow.async_method_containing_async_for:
+                recurse_into_nested_steps(remove_last_step, min_depth=1)})
+
+        asyncio.run(self.target.async_method_containing_async_for())
+
+        self.assertEqual([1, 2, 3], self.environment)
+
+    def test_random_stream_propagates_to_mutant_preparation(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.async_method_for_fuzzing: remove_random_step})
+
+        streams = [CounterRandom(7), CounterRandom(7)]
+        environments = [list(), list()]
+
+        async def run_agent(stream, environment):
+            with random_stream(stream):
+                await ExampleWorkflow(environment).async_method_for_fuzzing()
+
+        for stream, environment in zip(streams, environments):
+            asyncio.run(run_agent(stream, environment))
+
+        self.assertEqual(environments[0], environments[1])
+        self.assertGreater(streams[0].counter, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from pydysofu.campaign import run_campaign
+from pydysofu.config import current_random
+from pydysofu.core_fuzzers import *
+
+from example_workflow import ExampleWorkflow
+
+
+def setup():
+    return ExampleWorkflow
+
+
+def trial(clazz):
+    environment = list()
+    clazz(environment).method_for_fuzzing()
+    return environment
+
+
+test_advice = {
+    ExampleWorkflow.method_for_fuzzing:
+        on_condition_that(lambda: current_random().random() < 0.5, replace_steps_with(2, 3))
+}
+
+
+class CampaignTest(unittest.TestCase):
+
+    def test_campaign_outcomes(self):
+        outcomes = list(run_campaign(setup, test_advice, trial, 40, workers=2, seed=1, chunk_size=3))
+
+        self.assertEqual(40, len(outcomes))
+        self.assertTrue(all(outcome in ([1, 2], [1, 2, 3]) for outcome in outcomes))
+        self.assertIn([1, 2], outcomes)
+        self.assertIn([1, 2, 3], outcomes)
+
+    def test_campaigns_are_reproducible(self):
+        first_outcomes = list(run_campaign(setup, test_advice, trial, 20, workers=2, seed=7))
+        second_outcomes = list(run_campaign(setup, test_advice, trial, 20, workers=3, seed=7, chunk_size=1))
+
+        self.assertEqual(first_outcomes, second_outcomes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+
+from threading import Thread
+
+import pydysofu as fm
+
+from pydysofu.config import BatchedRandom, CounterRandom, current_random, random_stream
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class RandomStreamTest(unittest.TestCase):
+
+    def test_counter_random_is_reproducible(self):
+        first = CounterRandom(3, stream=5)
+        second = CounterRandom(3, stream=5)
+
+        self.assertEqual([first.random() for _ in range(0, 10)], [second.random() for _ in range(0, 10)])
+
+    def test_counter_random_regenerates_from_counter(self):
+        stream = CounterRandom(3)
+        draws = [stream.getrandbits(64) for _ in range(0, 10)]
+
+        regenerated = CounterRandom(3, counter=6)
+
+        self.assertEqual(draws[6:], [regenerated.getrandbits(64) for _ in range(0, 4)])
+
+    def test_streams_differ(self):
+        self.assertNotEqual(CounterRandom(3, stream=0).random(), CounterRandom(3, stream=1).random())
+
+    def test_random_stream_is_scoped_to_context(self):
+        stream = CounterRandom(1)
+        threads_random = list()
+
+        with random_stream(stream):
+            self.assertIs(stream, current_random())
+
+            thread = Thread(target=lambda: threads_random.append(current_random()))
+            thread.start()
+            thread.join()
+
+        self.assertIs(fm.pydysofu_random, current_random())
+        self.assertIs(fm.pydysofu_random, threads_random[0])
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class BatchedRandomTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pydysofu_random_state = fm.pydysofu_random.getstate()
+
+    def tearDown(self):
+        fm.pydysofu_random.setstate(self.pydysofu_random_state)
+
+    def test_seeded_from_pydysofu_random(self):
+        fm.pydysofu_random.seed(7)
+        first = BatchedRandom(batch_size=4)
+        fm.pydysofu_random.seed(7)
+        second = BatchedRandom(batch_size=4)
+
+        self.assertEqual([first.random() for _ in range(0, 10)], [second.random() for _ in range(0, 10)])
+        self.assertEqual(first.sample(range(0, 100), 5), second.sample(range(0, 100), 5))
+
+    def test_state_round_trip(self):
+        stream = BatchedRandom(3, batch_size=4)
+        stream.random()
+        state = stream.getstate()
+        draws = [stream.randrange(0, 1000) for _ in range(0, 10)]
+
+        stream.setstate(state)
+
+        self.assertEqual(draws, [stream.randrange(0, 1000) for _ in range(0, 10)])
+
+    def test_shuffle_distribution(self):
+        stream = BatchedRandom(11, batch_size=64)
+        counts = dict()
+        for _ in range(0, 6000):
+            order = [0, 1, 2]
+            stream.shuffle(order)
+            counts[tuple(order)] = counts.get(tuple(order), 0) + 1
+
+        self.assertEqual(6, len(counts))
+        self.assertTrue(all(800 < count < 1200 for count in counts.values()))
+
+    def test_sample_distribution(self):
+        stream = BatchedRandom(5, batch_size=64)
+        counts = dict()
+        for _ in range(0, 6000):
+            sample = tuple(stream.sample(range(0, 3), 2))
+            counts[sample] = counts.get(sample, 0) + 1
+
+        self.assertEqual(6, len(counts))
+        self.assertTrue(all(800 < count < 1200 for count in counts.values()))
+
+    def test_large_populations_are_not_batched(self):
+        stream = BatchedRandom(5, max_population=4)
+        steps = list(range(0, 10))
+
+        stream.shuffle(steps)
+
+        self.assertEqual(list(range(0, 10)), sorted(steps))
+        self.assertEqual({}, stream.getstate()[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
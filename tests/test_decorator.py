@@ -22,6 +22,11 @@ class ExampleWorkflow(object):
     def __init__(self, environment):
         self.environment = environment
 
+    @fm.fuzz(remove_last_step, sampling_rate=0.5)
+    def mangled_function_sampled_remove_last_step(self):
+        self.environment.append(1)
+        self.environment.append(2)
+
     @fm.fuzz(identity)
     def mangled_function_identity(self):
         self.environment.append(1)
@@ -138,7 +143,7 @@ class ExampleWorkflow(object):
         for i in [1, 2, 3, 4, ]:
             self.environment.append(i)
 
-    @fm.fuzz(recurse_into_nested_steps(remove_last_step, target_structures={ast.For, ast.TryExcept}))
+    @fm.fuzz(recurse_into_nested_steps(remove_last_step, target_structures={ast.For, ast.Try}))
     def manged_function_with_nested_for_and_try(self):
         for i in range(0, 3):
             try:
@@ -181,6 +186,11 @@ class FuzziMossDecoratorTest(unittest.TestCase):
         self.environment = list()
         self.target = ExampleWorkflow(self.environment)
 
+    def tearDown(self):
+        # Remove the mocks some tests install on the shared random number generator.
+        for name in ('sample', 'shuffle', 'uniform'):
+            vars(fm.pydysofu_random).pop(name, None)
+
     def test_identity(self):
         self.target.mangled_function_identity()
         self.assertEquals([1, 2, 3], self.environment)
@@ -278,6 +288,12 @@ class FuzziMossDecoratorTest(unittest.TestCase):
         self.assertEquals([0, 1, 2, 7], self.environment)
         pass
 
+    def test_mangled_function_sampled_remove_last_step(self):
+        with fm.random_stream(Mock(random=Mock(side_effect=[0.9, 0.1]))):
+            self.target.mangled_function_sampled_remove_last_step()
+            self.target.mangled_function_sampled_remove_last_step()
+        self.assertEqual([1, 2, 1], self.environment)
+
     def test_mangled_function_excluding_control_structures(self):
         self.target.mangled_function_excluding_control_structures()
         self.assertEquals([1, 2], self.environment)
@@ -292,6 +308,21 @@ class FuzziMossDecoratorTest(unittest.TestCase):
         self.assertEquals(None, result)
         self.assertEquals(self.environment, [1, 2, 3])
 
+    def test_function_decorated_while_fuzzing_disabled(self):
+        fm.fuzz.enable_fuzzings = False
+        try:
+            @fm.fuzz(remove_last_step)
+            def function_decorated_while_fuzzing_disabled(environment):
+                environment.append(1)
+                environment.append(2)
+
+            function_decorated_while_fuzzing_disabled(self.environment)
+        finally:
+            fm.fuzz.enable_fuzzings = True
+
+        function_decorated_while_fuzzing_disabled(self.environment)
+        self.assertEqual([1, 2, 1], self.environment)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,81 @@
+import json
+import marshal
+
+import unittest
+
+from pydysofu.core_fuzzers import *
+from pydysofu.edit_plan import apply_edit_plan, derive_edit_plan
+from pydysofu.fuzz_weaver import edit_plan, get_reference_syntax_tree, planned_mutant_code
+
+from example_workflow import ExampleWorkflow
+
+
+class EditPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.environment = list()
+        self.target = ExampleWorkflow(self.environment)
+
+    def reference_steps(self, reference_function):
+        return get_reference_syntax_tree(reference_function).body[0].body
+
+    def assert_round_trip(self, reference_function, fuzzer):
+        reference_steps = self.reference_steps(reference_function)
+        with copying_on_write():
+            fuzzed_steps = fuzzer(list(reference_steps), None)
+
+        plan = derive_edit_plan(reference_steps, fuzzed_steps)
+
+        self.assertEqual(
+            [ast.dump(step) for step in fuzzed_steps],
+            [ast.dump(step) for step in apply_edit_plan(reference_steps, plan)])
+        return plan
+
+    def test_structural_edits_are_step_regions(self):
+        plan = self.assert_round_trip(ExampleWorkflow.method_for_fuzzing, duplicate_last_step)
+
+        self.assertEqual((('steps', 0, 3), ('steps', 2, 3)), plan)
+
+    def test_replaced_steps(self):
+        plan = self.assert_round_trip(ExampleWorkflow.method_for_fuzzing, replace_steps_with(1, 2))
+
+        self.assertEqual((('steps', 0, 1), ('pass',), ('steps', 2, 3)), plan)
+
+    def test_swapped_branches(self):
+        plan = self.assert_round_trip(ExampleWorkflow.method_containing_if, swap_if_blocks)
+
+        self.assertEqual((('swap_branches', 0),), plan)
+
+    def test_replaced_test(self):
+        plan = self.assert_round_trip(ExampleWorkflow.method_containing_if, replace_condition_with('1 == 2'))
+
+        self.assertEqual((('replace_test', 0, '1 == 2'),), plan)
+
+    def test_nested_edits_are_statements(self):
+        plan = self.assert_round_trip(
+            ExampleWorkflow.method_containing_iterator, recurse_into_nested_steps(remove_last_step, min_depth=1))
+
+        self.assertEqual('statement', plan[0][0])
+
+    def test_plans_are_serialisable(self):
+        plan = edit_plan(ExampleWorkflow.method_containing_if, in_sequence([swap_if_blocks, duplicate_steps]))
+
+        self.assertEqual(plan, tuple(tuple(operation) for operation in json.loads(json.dumps(plan))))
+        self.assertEqual(plan, marshal.loads(marshal.dumps(plan)))
+        self.assertEqual(hash(plan), hash(marshal.loads(marshal.dumps(plan))))
+
+    def test_planned_mutant_code(self):
+        plan = (('steps', 2, 3), ('pass',), ('steps', 0, 1))
+
+        ExampleWorkflow.method_for_fuzzing.__code__, original_code = \
+            planned_mutant_code(ExampleWorkflow.method_for_fuzzing, plan), ExampleWorkflow.method_for_fuzzing.__code__
+        try:
+            self.target.method_for_fuzzing()
+        finally:
+            ExampleWorkflow.method_for_fuzzing.__code__ = original_code
+
+        self.assertEqual([3, 1], self.environment)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import ast
 import unittest
 
 import pydysofu.find_lambda
@@ -8,7 +9,7 @@ class FindLambdaUnitTest(unittest.TestCase):
     def test_one_lambda(self):
         result = pydysofu.find_lambda.find_lambda_ast(
             'ExampleWorkflow.method_containing_if: replace_condition_with(lambda: False)', lambda: False)
-        self.assertEqual('False', result.value.body.id)
+        self.assertEqual('False', ast.unparse(result.value.body))
 
     def test_two_lambdas(self):
         result = \
@@ -16,4 +17,32 @@ class FindLambdaUnitTest(unittest.TestCase):
                 '...in_sequence([replace_condition_with(lambda: False), replace_condition_with(lambda: True)])',
                 lambda: True
             )
-        self.assertEqual('True', result.value.body.id)
+        self.assertEqual('True', ast.unparse(result.value.body))
+
+    def test_lambda_ast_of_nested_lambdas(self):
+        conditions = [lambda: False, lambda: (lambda: True)]
+
+        self.assertEqual(False, pydysofu.find_lambda.lambda_ast(conditions[0]).body.value)
+        self.assertEqual('Lambda', type(pydysofu.find_lambda.lambda_ast(conditions[1]).body).__name__)
+        self.assertEqual(True, pydysofu.find_lambda.lambda_ast(conditions[1]()).body.value)
+
+    def test_lambda_ast_of_multiline_lambda(self):
+        condition = (lambda x=1,
+                     y=2: x > y)
+
+        self.assertEqual('x > y', ast.unparse(pydysofu.find_lambda.lambda_ast(condition).body))
+
+    def test_lambda_ast_is_cached(self):
+        condition = lambda: {'a': 1}['a'] == 1
+
+        self.assertIs(pydysofu.find_lambda.lambda_ast(condition), pydysofu.find_lambda.lambda_ast(condition))
+
+    def test_deprecated_find_candidate_object(self):
+        source_line = 'in_sequence([replace_condition_with(lambda: False), replace_condition_with(lambda: True)])'
+
+        with self.assertWarns(DeprecationWarning):
+            candidate_object, candidate_source, end = pydysofu.find_lambda.find_candidate_object(40, source_line)
+
+        self.assertEqual('lambda: True', candidate_source)
+        self.assertEqual(source_line.index('lambda: True') + len('lambda: True'), end)
+        self.assertEqual((lambda: True).__code__.co_code, candidate_object.co_code)
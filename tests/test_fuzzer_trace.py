@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+
+import unittest
+
+import pydysofu as fm
+
+from pydysofu.core_fuzzers import *
+
+from example_workflow import ExampleWorkflow
+
+
+class FuzzerTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        fm.defuzz_all_classes()
+        self.environment = list()
+        self.target = ExampleWorkflow(self.environment)
+        self.recorder = fm.TraceRecorder(capacity=8)
+        fm.set_trace_recorder(self.recorder)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        fm.set_trace_recorder(None)
+        fm.defuzz_all_classes()
+        shutil.rmtree(self.directory)
+
+    def test_trace_fuzzer_applications(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: duplicate_last_step})
+
+        self.target.method_for_fuzzing()
+        self.target.method_for_fuzzing()
+
+        events = list(self.recorder.events())
+        self.assertEqual(2, len(events))
+
+        sequence, call, context, fuzzer, method, workflow, region_start, region_end = events[1]
+        self.assertEqual((1, 2, id(self.target)), (sequence, call, context))
+        self.assertEqual('pydysofu.core_fuzzers.duplicate_steps', fuzzer)
+        self.assertEqual('example_workflow.ExampleWorkflow.method_for_fuzzing', method)
+        self.assertEqual('example_workflow.ExampleWorkflow', workflow)
+        self.assertEqual((2, 3), (region_start, region_end))
+
+    def test_ring_buffer_keeps_latest_events(self):
+        for _ in range(20):
+            shuffle_steps([], self.target)
+
+        self.assertEqual(8, len(self.recorder))
+        self.assertEqual(12, self.recorder.dropped)
+        self.assertEqual(list(range(12, 20)), [event[0] for event in self.recorder.events()])
+
+        sequence, call, _, _, method, _, region_start, region_end = next(self.recorder.events())
+        self.assertEqual((12, 0, '', -1, -1), (sequence, call, method, region_start, region_end))
+
+    def test_save_and_load(self):
+        path = os.path.join(self.directory, 'trace.bin')
+        for _ in range(10):
+            shuffle_steps([], self.target)
+
+        self.recorder.save(path)
+        trace = fm.TraceRecorder.load(path)
+
+        self.assertEqual(10, trace['recorded'])
+        self.assertEqual(list(range(2, 10)), list(trace['sequence']))
+        self.assertEqual(['pydysofu.core_fuzzers.shuffle_steps'], trace['names']['fuzzer'][1:])
+        self.assertEqual({1}, set(trace['fuzzer']))
+
+    def test_export_csv(self):
+        path = os.path.join(self.directory, 'trace.csv')
+        swap_if_blocks([], self.target)
+
+        self.recorder.export_csv(path)
+
+        with open(path) as csv_file:
+            lines = csv_file.read().splitlines()
+        self.assertEqual('sequence,call,context,fuzzer,method,workflow,region_start,region_end', lines[0])
+        self.assertEqual(2, len(lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
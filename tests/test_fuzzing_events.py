@@ -0,0 +1,152 @@
+import asyncio
+
+import unittest
+
+from threading import Thread
+
+import pydysofu as fm
+
+from pydysofu.core_fuzzers import *
+from pydysofu.fuzzing_events import CACHE_HIT, FUZZER_APPLIED, METHOD_EXECUTED, MUTANT_BUILT, BLOCK, DROP_NEWEST, \
+    publish_event
+
+from example_workflow import ExampleWorkflow
+
+
+class FuzzingEventsTest(unittest.TestCase):
+
+    def setUp(self):
+        fm.defuzz_all_classes()
+        self.environment = list()
+        self.target = ExampleWorkflow(self.environment)
+
+    def tearDown(self):
+        fm.defuzz_all_classes()
+
+    def test_events_of_a_woven_call(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: shuffle_steps})
+
+        with fm.subscribe() as subscription:
+            self.target.method_for_fuzzing()
+
+        events = list(subscription)
+        self.assertEqual([FUZZER_APPLIED, MUTANT_BUILT, METHOD_EXECUTED], [event.kind for event in events])
+        self.assertEqual('method_for_fuzzing', events[2].method.__name__)
+        self.assertIs(shuffle_steps, events[2].fuzzer)
+        self.assertIs(self.target, events[2].context)
+
+    def test_cache_hits(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: remove_last_step},
+                      mutant_cache=fm.MutantCache())
+
+        with fm.subscribe(kinds={MUTANT_BUILT, CACHE_HIT}) as subscription:
+            self.target.method_for_fuzzing()
+            self.target.method_for_fuzzing()
+
+        self.assertEqual([MUTANT_BUILT, CACHE_HIT], [event.kind for event in subscription])
+
+    def test_drop_oldest_and_newest(self):
+        with fm.subscribe(max_size=2) as oldest, fm.subscribe(max_size=2, overflow=DROP_NEWEST) as newest:
+            for i in range(5):
+                publish_event(FUZZER_APPLIED, context=i)
+
+        self.assertEqual([3, 4], [event.context for event in oldest])
+        self.assertEqual([0, 1], [event.context for event in newest])
+        self.assertEqual((3, 3), (oldest.dropped, newest.dropped))
+
+    def test_blocking_subscription_applies_backpressure(self):
+        subscription = fm.subscribe(max_size=4, overflow=BLOCK)
+
+        def publish():
+            for i in range(100):
+                publish_event(FUZZER_APPLIED, context=i)
+            subscription.close()
+
+        thread = Thread(target=publish)
+        thread.start()
+        consumed = [event.context for batch in subscription.batches() for event in batch]
+        thread.join()
+
+        self.assertEqual(list(range(100)), consumed)
+        self.assertEqual(0, subscription.dropped)
+
+    def test_asynchronous_iteration(self):
+        subscription = fm.subscribe(max_size=8)
+
+        async def consume():
+            consumed = list()
+            async for batch in subscription:
+                consumed.extend(event.context for event in batch)
+            return consumed
+
+        def publish():
+            for i in range(3):
+                publish_event(FUZZER_APPLIED, context=i)
+            subscription.close()
+
+        async def run():
+            consumer = asyncio.ensure_future(consume())
+            await asyncio.get_running_loop().run_in_executor(None, publish)
+            return await consumer
+
+        self.assertEqual([0, 1, 2], asyncio.run(run()))
+
+    def test_blocking_subscription_is_bounded_with_several_publishers(self):
+        subscription = fm.subscribe(max_size=2, overflow=BLOCK)
+
+        def publish():
+            for i in range(200):
+                publish_event(FUZZER_APPLIED, context=i)
+
+        threads = [Thread(target=publish) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+
+        consumed = 0
+        queue_sizes = list()
+        while consumed < 800:
+            queue_sizes.append(len(subscription))
+            consumed += len(subscription.get_batch(1))
+
+        for thread in threads:
+            thread.join()
+        subscription.close()
+
+        self.assertLessEqual(max(queue_sizes), 2)
+
+    def test_cancelled_asynchronous_consumer(self):
+        subscription = fm.subscribe()
+        finished = list()
+
+        async def consume():
+            async for _ in subscription:
+                pass
+
+        async def run():
+            consumer = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.01)
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+
+        def run_loop():
+            asyncio.run(run())
+            finished.append(True)
+
+        thread = Thread(target=run_loop, daemon=True)
+        thread.start()
+        thread.join(5)
+        subscription.close()
+
+        self.assertEqual([True], finished)
+
+    def test_closed_subscriptions_receive_no_events(self):
+        subscription = fm.subscribe()
+        subscription.close()
+
+        publish_event(FUZZER_APPLIED)
+
+        self.assertIsNone(subscription.get(timeout=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
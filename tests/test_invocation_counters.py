@@ -0,0 +1,55 @@
+import unittest
+
+from threading import Thread
+
+from pydysofu.core_fuzzers import *
+
+
+class Workflow(object):
+    pass
+
+
+class OtherWorkflow(object):
+    pass
+
+
+class InvocationCountersTest(unittest.TestCase):
+
+    def setUp(self):
+        reset_invocation_counters()
+
+    def test_invocations_are_counted_across_threads(self):
+
+        def invoke_repeatedly(context):
+            for _ in range(0, 1000):
+                swap_if_blocks([], context)
+
+        threads = [Thread(target=invoke_repeatedly, args=(c,)) for c in (Workflow(), Workflow(), OtherWorkflow())]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(3000, fuzzer_invocations_count())
+        self.assertEqual(2000, fuzzer_invocations_count(Workflow))
+        self.assertEqual(1000, fuzzer_invocations_count(OtherWorkflow))
+        self.assertEqual(2, len(fuzzer_invocations))
+
+    def test_reset_invocation_counters(self):
+        shuffle_steps([], Workflow())
+        reset_invocation_counters()
+
+        self.assertEqual(0, fuzzer_invocations_count(Workflow))
+        self.assertEqual({}, dict(fuzzer_invocations))
+
+    def test_fuzzer_factories_are_not_counted(self):
+        fuzzer = insert_steps(0, 'pass')
+        self.assertEqual(0, fuzzer_invocations_count())
+
+        fuzzer([], Workflow())
+        self.assertEqual(0, fuzzer_invocations_count(str))
+        self.assertEqual(1, fuzzer_invocations_count(Workflow))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import ast
+
+import unittest
+
+from mock import Mock, patch
+
+import pydysofu as fm
+
+from pydysofu.core_fuzzers import *
+from pydysofu.fingerprint import fingerprint
+from pydysofu.fuzz_weaver import get_reference_syntax_tree
+from pydysofu.mutant_cache import MutantCodeTable
+
+from example_workflow import ExampleWorkflow
+
+
+class MutantCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.environment = list()
+        self.target = ExampleWorkflow(self.environment)
+        self.mutant_cache = fm.MutantCache(max_size=2)
+
+    def test_repeated_decision_reuses_mutant(self):
+        fm.pydysofu_random.sample = Mock(side_effect=[[1], [1]])
+
+        test_advice = {
+            ExampleWorkflow.method_for_fuzzing: remove_random_step
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, mutant_cache=self.mutant_cache)
+
+        self.target.method_for_fuzzing()
+        self.target.method_for_fuzzing()
+
+        self.assertEqual([1, 3, 1, 3], self.environment)
+        self.assertEqual(1, self.mutant_cache.misses)
+        self.assertEqual(1, self.mutant_cache.hits)
+
+    def test_different_decisions_compile_different_mutants(self):
+        fm.pydysofu_random.sample = Mock(side_effect=[[1], [0]])
+
+        test_advice = {
+            ExampleWorkflow.method_for_fuzzing: remove_random_step
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, mutant_cache=self.mutant_cache)
+
+        self.target.method_for_fuzzing()
+        self.target.method_for_fuzzing()
+
+        self.assertEqual([1, 3, 2, 3], self.environment)
+        self.assertEqual(2, self.mutant_cache.misses)
+        self.assertEqual(0, self.mutant_cache.hits)
+
+    def test_reference_syntax_tree_is_not_copied_when_copying_on_write(self):
+        fm.pydysofu_random.sample = Mock(side_effect=[[1], [1]])
+
+        test_advice = {
+            ExampleWorkflow.method_for_fuzzing: remove_random_step
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, mutant_cache=self.mutant_cache, copy_on_write=True)
+
+        with patch('pydysofu.fuzz_weaver.copy.deepcopy') as deepcopy:
+            self.target.method_for_fuzzing()
+            self.target.method_for_fuzzing()
+
+        deepcopy.assert_not_called()
+        self.assertEqual([1, 3, 1, 3], self.environment)
+        self.assertEqual(1, self.mutant_cache.hits)
+
+    def test_fuzzers_may_modify_steps_in_place(self):
+
+        def increment_last_value_in_place(steps, context):
+            steps[-1].value.args[0].value += 10
+            return steps
+
+        reference_syntax_tree = get_reference_syntax_tree(ExampleWorkflow.method_for_fuzzing)
+        reference_dump = ast.dump(reference_syntax_tree)
+
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: increment_last_value_in_place},
+                      mutant_cache=self.mutant_cache)
+
+        self.target.method_for_fuzzing()
+        self.target.method_for_fuzzing()
+
+        self.assertEqual([1, 2, 13, 1, 2, 13], self.environment)
+        self.assertEqual(reference_dump, ast.dump(reference_syntax_tree))
+
+    def test_least_recently_used_mutant_is_evicted(self):
+        fm.pydysofu_random.sample = Mock(side_effect=[[0], [1], [0], [2], [1]])
+
+        test_advice = {
+            ExampleWorkflow.method_for_fuzzing: remove_random_step
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, mutant_cache=self.mutant_cache)
+
+        for _ in range(0, 5):
+            self.target.method_for_fuzzing()
+
+        self.assertEqual([2, 3, 1, 3, 2, 3, 1, 2, 1, 3], self.environment)
+        self.assertEqual({'hits': 1, 'misses': 4, 'evictions': 2, 'size': 2}, self.mutant_cache.statistics())
+
+
+class MutantCodeTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.code_table = MutantCodeTable()
+
+    def test_identical_syntax_trees_have_equal_fingerprints(self):
+        self.assertEqual(fingerprint(ast.parse('x = [1, 2]')), fingerprint(ast.parse('x = [1, 2]')))
+
+    def test_equal_constants_of_different_types_have_different_fingerprints(self):
+        self.assertNotEqual(fingerprint(ast.parse('x = 1')), fingerprint(ast.parse('x = 1.0')))
+        self.assertNotEqual(fingerprint(ast.parse('x = 0.0')), fingerprint(ast.parse('x = -0.0')))
+
+    def test_identical_mutants_are_compiled_once(self):
+        first = self.code_table.code_for(ast.parse('def f():\n    pass\n'), 'example.py')
+        second = self.code_table.code_for(ast.parse('def f():\n    pass\n'), 'example.py')
+
+        self.assertIs(first, second)
+        self.assertEqual(1, self.code_table.misses)
+        self.assertEqual(1, self.code_table.hits)
+
+    def test_mutants_differing_in_position_are_compiled_separately(self):
+        first = self.code_table.code_for(ast.parse('def f():\n    pass\n'), 'example.py')
+        second = self.code_table.code_for(ast.parse('\ndef f():\n    pass\n'), 'example.py')
+
+        self.assertIsNot(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from mock import patch
+
+import pydysofu as fm
+
+from pydysofu.core_fuzzers import *
+from pydysofu.mutant_library import MutantLibrary, UnenumerableFuzzerError, enumerate_mutants, main
+
+from example_workflow import ExampleWorkflow
+
+
+class MutantLibraryTest(unittest.TestCase):
+
+    def setUp(self):
+        fm.defuzz_all_classes()
+        self.environment = list()
+        self.target = ExampleWorkflow(self.environment)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        fm.defuzz_all_classes()
+        shutil.rmtree(self.directory)
+
+    def run_mutant(self, code):
+        ExampleWorkflow.method_for_fuzzing.__code__, original_code = code, ExampleWorkflow.method_for_fuzzing.__code__
+        try:
+            environment = list()
+            ExampleWorkflow(environment).method_for_fuzzing()
+            return environment
+        finally:
+            ExampleWorkflow.method_for_fuzzing.__code__ = original_code
+
+    def test_enumerate_shuffled_steps(self):
+        mutants = enumerate_mutants(ExampleWorkflow.method_for_fuzzing, shuffle_steps)
+
+        environments = sorted(self.run_mutant(code) for code, _ in mutants)
+
+        self.assertEqual(
+            [[1, 2, 3], [1, 3, 2], [2, 1, 3], [2, 3, 1], [3, 1, 2], [3, 2, 1]],
+            environments)
+        self.assertAlmostEqual(1.0, sum(weight for _, weight in mutants))
+
+    def test_enumerate_identical_mutants_once(self):
+        fuzzer = filter_steps(choose_random_steps(2), replace_steps_with_pass)
+
+        mutants = enumerate_mutants(ExampleWorkflow.method_for_fuzzing, fuzzer)
+
+        self.assertEqual(1, len(mutants))
+        self.assertEqual([3], self.run_mutant(mutants[0][0]))
+        self.assertAlmostEqual(1.0, mutants[0][1])
+
+    def test_continuous_draws_cannot_be_enumerated(self):
+        fuzzer = choose_from([(0.5, identity), (0.5, shuffle_steps)])
+
+        with self.assertRaises(UnenumerableFuzzerError):
+            enumerate_mutants(ExampleWorkflow.method_for_fuzzing, fuzzer)
+
+    def test_fuzz_with_library(self):
+        mutant_library = MutantLibrary()
+        mutant_library.add(ExampleWorkflow.method_for_fuzzing, remove_random_step)
+
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: remove_random_step},
+                      mutant_library=mutant_library)
+        with patch('pydysofu.fuzz_weaver.get_reference_syntax_tree') as get_reference_syntax_tree:
+            self.target.method_for_fuzzing()
+            self.assertFalse(get_reference_syntax_tree.called)
+
+        self.assertIn(self.environment, [[2, 3], [1, 3]])
+
+    def test_library_is_not_used_for_other_fuzzers(self):
+        mutant_library = MutantLibrary()
+        mutant_library.add(ExampleWorkflow.method_for_fuzzing, remove_last_steps(1, reapply=True))
+
+        self.assertEqual(
+            1, len(mutant_library.mutants(ExampleWorkflow.method_for_fuzzing, remove_last_steps(1, reapply=True))))
+        self.assertEqual(
+            (), mutant_library.mutants(ExampleWorkflow.method_for_fuzzing, remove_last_steps(2, reapply=True)))
+
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: remove_last_steps(2, reapply=True)},
+                      mutant_library=mutant_library)
+        self.target.method_for_fuzzing()
+
+        self.assertEqual([1], self.environment)
+
+    def test_stateful_fuzzers_are_rejected(self):
+        fuzzer = remove_last_steps(1)
+        mutant_library = MutantLibrary()
+
+        with self.assertRaises(UnenumerableFuzzerError):
+            mutant_library.add(ExampleWorkflow.method_for_fuzzing, fuzzer)
+
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: fuzzer}, mutant_library=mutant_library)
+        self.target.method_for_fuzzing()
+        self.target.method_for_fuzzing()
+
+        self.assertEqual([1, 2, 1, 2, 3], self.environment)
+
+    def test_save_and_load(self):
+        path = os.path.join(self.directory, 'workflow.mutants')
+        mutant_library = MutantLibrary()
+        mutant_library.add(ExampleWorkflow.method_for_fuzzing, remove_random_step)
+        mutant_library.save(path)
+
+        loaded_mutant_library = MutantLibrary.load(path)
+
+        self.assertIn(ExampleWorkflow.method_for_fuzzing, loaded_mutant_library)
+        self.assertEqual(
+            [self.run_mutant(code) for code in mutant_library.mutants(
+                ExampleWorkflow.method_for_fuzzing, remove_random_step)],
+            [self.run_mutant(code) for code in loaded_mutant_library.mutants(
+                ExampleWorkflow.method_for_fuzzing, remove_random_step)])
+
+    def test_command_line(self):
+        path = os.path.join(self.directory, 'workflow.mutants')
+
+        main([path, 'example_workflow:ExampleWorkflow.method_for_fuzzing', 'shuffle_steps'])
+
+        self.assertEqual(6, len(MutantLibrary.load(path).mutants(ExampleWorkflow.method_for_fuzzing, shuffle_steps)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import ast
+
+import unittest
+
+import pydysofu as fm
+
+from pydysofu.core_fuzzers import *
+from pydysofu.snippet_cache import snippet
+
+from example_workflow import ExampleWorkflow
+
+
+class SnippetCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        fm.defuzz_all_classes()
+        self.environment = list()
+        self.target = ExampleWorkflow(self.environment)
+
+    def tearDown(self):
+        fm.defuzz_all_classes()
+
+    def test_snippets_are_interned(self):
+        self.assertIs(snippet('self.environment.append(4)'), snippet('self.environment.append(4)'))
+        self.assertIsNot(snippet('1 == 2'), snippet('1 == 2', 'eval'))
+
+    def test_statements_are_shared_in_new_lists(self):
+        parsed_snippet = snippet('x = 1\ny = 2')
+
+        first_statements = parsed_snippet.statements()
+        second_statements = parsed_snippet.statements()
+
+        self.assertIsNot(first_statements, second_statements)
+        self.assertEqual([type(s) for s in first_statements], [ast.Assign, ast.Assign])
+        self.assertIs(first_statements[0], second_statements[0])
+
+    def test_syntax_errors_are_raised_on_use(self):
+        parsed_snippet = snippet('4bad_syntax')
+
+        with self.assertRaises(SyntaxError):
+            parsed_snippet.statements()
+
+    def test_inserted_steps_are_reused_across_calls(self):
+        fuzzer = in_sequence([insert_steps(0, 'self.environment.append(0)'), shuffle_steps])
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: fuzzer}, copy_on_write=True)
+
+        for _ in range(3):
+            self.target.method_for_fuzzing()
+
+        self.assertEqual([0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3], sorted(self.environment))
+
+    def test_replace_condition_with_string(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_containing_if: replace_condition_with('1 == 2')})
+
+        self.target.method_containing_if()
+        self.target.method_containing_if()
+
+        self.assertEqual([2, 2], self.environment)
+
+
+if __name__ == '__main__':
+    unittest.main()
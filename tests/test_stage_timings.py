@@ -0,0 +1,56 @@
+import unittest
+
+import pydysofu as fm
+
+from pydysofu.core_fuzzers import *
+from pydysofu.fuzz_weaver import fuzz_function, _reference_syntax_trees
+
+from example_workflow import ExampleWorkflow
+
+
+class StageTimingsTest(unittest.TestCase):
+
+    def setUp(self):
+        fm.defuzz_all_classes()
+        fm.reset_stage_timings()
+        self.environment = list()
+        self.target = ExampleWorkflow(self.environment)
+
+    def tearDown(self):
+        fm.enable_stage_timings(False)
+        fm.reset_stage_timings()
+        fm.defuzz_all_classes()
+
+    def test_disabled_by_default(self):
+        fuzz_function(ExampleWorkflow.method_for_fuzzing, shuffle_steps)
+
+        self.assertEqual(dict(), fm.stage_timings())
+
+    def test_stages_recorded_per_function(self):
+        reference_function = ExampleWorkflow.method_for_fuzzing
+        _reference_syntax_trees.pop(reference_function, None)
+        fm.enable_stage_timings()
+
+        fuzz_function(reference_function, shuffle_steps)
+        fuzz_function(reference_function, shuffle_steps, code_table=None)
+
+        timings = fm.stage_timings(reference_function)
+
+        self.assertEqual({'source', 'parse', 'copy', 'transform', 'fuzzer', 'compile'}, set(timings.keys()))
+        self.assertEqual(1, timings['parse']['count'])
+        self.assertEqual(2, timings['fuzzer']['count'])
+        self.assertEqual(2, sum(timings['compile']['histogram'].values()))
+        self.assertEqual(timings, fm.stage_timings())
+        self.assertEqual(dict(), fm.stage_timings(ExampleWorkflow.method_containing_if))
+
+    def test_reset(self):
+        fm.enable_stage_timings()
+        fuzz_function(ExampleWorkflow.method_for_fuzzing, shuffle_steps)
+
+        fm.reset_stage_timings()
+
+        self.assertEqual(dict(), fm.stage_timings())
+
+
+if __name__ == '__main__':
+    unittest.main()
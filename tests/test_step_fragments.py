@@ -0,0 +1,68 @@
+import unittest
+
+from mock import Mock
+
+import pydysofu as fm
+
+from pydysofu.core_fuzzers import *
+from pydysofu.fuzz_weaver import fuzz_function, get_step_fragments
+
+
+def workflow(environment):
+    environment.append(1)
+    environment.append(2)
+    environment.append(3)
+
+
+def workflow_containing_if(environment):
+    if True:
+        environment.append(1)
+    else:
+        environment.append(2)
+
+
+def workflow_containing_nested_function(environment):
+    def nested():
+        environment.append(1)
+    nested()
+    environment.append(2)
+
+
+class StepFragmentsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.environment = list()
+        get_step_fragments(workflow).selections.clear()
+
+    def test_each_selection_is_compiled_once(self):
+        fm.pydysofu_random.sample = Mock(side_effect=[[1], [0], [1]])
+
+        for _ in range(0, 3):
+            fuzz_function(workflow, remove_random_step, step_fragments=True)
+            workflow(self.environment)
+
+        selections = get_step_fragments(workflow).selections
+
+        self.assertEqual([1, 3, 2, 3, 1, 3], self.environment)
+        self.assertEqual(2, selections.misses)
+        self.assertEqual(1, selections.hits)
+
+    def test_duplicated_steps(self):
+        fuzz_function(workflow, duplicate_steps, step_fragments=True)
+        workflow(self.environment)
+
+        self.assertEqual([1, 2, 3, 1, 2, 3], self.environment)
+
+    def test_non_structural_fuzzers_are_cached_by_edit_plan(self):
+        fuzz_function(workflow_containing_if, swap_if_blocks, step_fragments=True)
+        workflow_containing_if(self.environment)
+
+        self.assertEqual([2], self.environment)
+        self.assertIsNotNone(get_step_fragments(workflow_containing_if).selections.get((('swap_branches', 0),)))
+
+    def test_functions_with_nested_definitions_are_not_eligible(self):
+        self.assertFalse(get_step_fragments(workflow_containing_nested_function).eligible)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import ast
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from mock import patch
+
+import pydysofu as fm
+
+import pydysofu.fuzz_weaver as fuzz_weaver
+
+from pydysofu.syntax_tree_cache import SyntaxTreeCache
+
+from example_workflow import ExampleWorkflow
+
+
+class SyntaxTreeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source_path = os.path.join(self.directory, 'workflow.py')
+        with open(self.source_path, 'w') as source_file:
+            source_file.write('def workflow():\n    pass\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_tree_survives_new_cache(self):
+        syntax_tree = ast.parse('def workflow():\n    pass\n')
+        SyntaxTreeCache(self.directory).store(self.source_path, ('workflow', 1), syntax_tree)
+
+        syntax_tree_cache = SyntaxTreeCache(self.directory)
+        cached_syntax_tree = syntax_tree_cache.load(self.source_path, ('workflow', 1))
+
+        self.assertEqual(ast.dump(syntax_tree), ast.dump(cached_syntax_tree))
+        self.assertEqual(1, syntax_tree_cache.hits)
+
+    def test_changed_source_invalidates_tree(self):
+        SyntaxTreeCache(self.directory).store(self.source_path, ('workflow', 1), ast.parse('pass'))
+
+        with open(self.source_path, 'w') as source_file:
+            source_file.write('def workflow():\n    return 1\n')
+
+        syntax_tree_cache = SyntaxTreeCache(self.directory)
+
+        self.assertIsNone(syntax_tree_cache.load(self.source_path, ('workflow', 1)))
+        self.assertEqual(1, syntax_tree_cache.misses)
+
+    def test_storing_a_tree_writes_only_its_cache_file(self):
+        syntax_tree_cache = SyntaxTreeCache(self.directory)
+        syntax_tree_cache.store(self.source_path, ('workflow', 1), ast.parse('pass'))
+        cache_path = syntax_tree_cache._cache_path(self.source_path, ('workflow', 1))
+        modified = os.stat(cache_path).st_mtime_ns
+
+        with patch('pydysofu.syntax_tree_cache.pickle.dump') as dump:
+            syntax_tree_cache.store(self.source_path, ('other_workflow', 3), ast.parse('pass'))
+            self.assertEqual(1, dump.call_count)
+            self.assertEqual(ast.dump(ast.parse('pass')), ast.dump(dump.call_args[0][0]['syntax_tree']))
+
+        self.assertEqual(modified, os.stat(cache_path).st_mtime_ns)
+
+    def test_corrupt_cache_file_is_ignored(self):
+        syntax_tree_cache = SyntaxTreeCache(self.directory)
+        with open(syntax_tree_cache._cache_path(self.source_path, ('workflow', 1)), 'wb') as cache_file:
+            cache_file.write(b'not a pickle')
+
+        self.assertIsNone(syntax_tree_cache.load(self.source_path, ('workflow', 1)))
+
+
+class ReferenceSyntaxTreeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        fm.defuzz_all_classes()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        fm.use_syntax_tree_cache(None)
+        shutil.rmtree(self.directory)
+
+    def test_warm_start_skips_parsing(self):
+        reference_function = ExampleWorkflow.method_for_fuzzing
+
+        fm.use_syntax_tree_cache(self.directory)
+        fuzz_weaver._reference_syntax_trees.pop(reference_function, None)
+        syntax_tree = fuzz_weaver.get_reference_syntax_tree(reference_function)
+
+        fm.use_syntax_tree_cache(self.directory)
+        fuzz_weaver._reference_syntax_trees.pop(reference_function, None)
+        with patch('pydysofu.fuzz_weaver.inspect.getsourcelines') as getsourcelines:
+            cached_syntax_tree = fuzz_weaver.get_reference_syntax_tree(reference_function)
+            self.assertFalse(getsourcelines.called)
+
+        self.assertEqual(ast.dump(syntax_tree), ast.dump(cached_syntax_tree))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,16 @@
 import unittest
 
+from random import Random
+from threading import Thread
+
 from mock import Mock
 
 import pydysofu as fm
 
 from pydysofu.core_fuzzers import *
 
+from pydysofu.fuzz_weaver import get_reference_syntax_tree
+
 from example_workflow import ExampleWorkflow
 
 
@@ -138,6 +143,21 @@ class FuzziMossWeaverTest(unittest.TestCase):
         self.target.method_for_fuzzing()
         self.assertEqual([1, 2, 1, 2], self.environment)
 
+    def test_choose_from_reweighted(self):
+        fm.pydysofu_random.uniform = Mock(side_effect=lambda a, b: b)
+
+        fuzzer = choose_from([(0.5, identity), (0.5, remove_last_step)])
+        fuzzer.reweight(1, 0.0)
+
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: fuzzer})
+
+        self.target.method_for_fuzzing()
+        self.assertEqual([1, 2, 3], self.environment)
+
+    def test_choose_from_empty_distribution(self):
+        with fm.random_stream(Random(1)), self.assertRaises(ValueError):
+            choose_from([])([ast.Pass()], None)
+
     def test_in_sequence(self):
 
         test_advice = {
@@ -224,7 +244,7 @@ class FuzziMossWeaverTest(unittest.TestCase):
 
         test_advice = {
             ExampleWorkflow.method_containing_for_and_nested_try:
-                recurse_into_nested_steps(remove_last_step, target_structures={ast.For, ast.TryExcept})
+                recurse_into_nested_steps(remove_last_step, target_structures={ast.For, ast.Try})
         }
         fm.fuzz_clazz(ExampleWorkflow, test_advice)
 
@@ -326,5 +346,196 @@ class FuzziMossWeaverTest(unittest.TestCase):
 
         self.assertRaises(StandardError, self.target.method_for_fuzzing)
 
+    def test_copy_on_write_swap_if_blocks(self):
+        reference_syntax_tree = get_reference_syntax_tree(ExampleWorkflow.method_containing_if)
+        reference_dump = ast.dump(reference_syntax_tree, include_attributes=True)
+
+        test_advice = {
+            ExampleWorkflow.method_containing_if: swap_if_blocks
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, copy_on_write=True)
+
+        self.target.method_containing_if()
+        self.assertEquals([2], self.environment)
+        self.assertEquals(reference_dump, ast.dump(reference_syntax_tree, include_attributes=True))
+
+    def test_copy_on_write_nested_steps(self):
+        reference_syntax_tree = get_reference_syntax_tree(ExampleWorkflow.method_containing_for_and_nested_try)
+        reference_dump = ast.dump(reference_syntax_tree, include_attributes=True)
+
+        test_advice = {
+            ExampleWorkflow.method_containing_for_and_nested_try:
+                recurse_into_nested_steps(replace_steps_with(2, 3), target_structures={ast.For, ast.Try}, min_depth=1)
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, copy_on_write=True)
+
+        self.target.method_containing_for_and_nested_try()
+        self.assertEquals(
+            [0, "TO BE REMOVED", 1, "TO BE REMOVED", 2, 7, 9, "TO BE REMOVED", "TO BE REMOVED"], self.environment)
+        self.assertEquals(reference_dump, ast.dump(reference_syntax_tree, include_attributes=True))
+
+    def test_targeted_fuzzing_leaves_nested_functions(self):
+        reference_syntax_tree = get_reference_syntax_tree(ExampleWorkflow.method_containing_nested_function)
+        reference_dump = ast.dump(reference_syntax_tree, include_attributes=True)
+
+        test_advice = {
+            ExampleWorkflow.method_containing_nested_function: insert_steps(1, 'self.environment.append(0)')
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, targeted=True)
+
+        self.target.method_containing_nested_function()
+        self.assertEquals([0, 1, 10, 2], self.environment)
+        self.assertEquals(reference_dump, ast.dump(reference_syntax_tree, include_attributes=True))
+
+    def test_targeted_fuzzing_of_named_nested_functions(self):
+        test_advice = {
+            ExampleWorkflow.method_containing_nested_function: insert_steps(1, 'self.environment.append(0)')
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, targeted=True, fuzz_nested={'record'})
+
+        self.target.method_containing_nested_function()
+        self.assertEquals([0, 1, 0, 10, 2], self.environment)
+
+    def test_simplify_sequences(self):
+        fuzzer = simplify(in_sequence([
+            identity,
+            in_sequence([shuffle_steps, identity]),
+            on_condition_that(True, duplicate_steps),
+            on_condition_that(False, swap_if_blocks)
+        ]))
+
+        self.assertIs(in_sequence, fuzzer.combinator)
+        self.assertEquals([shuffle_steps, duplicate_steps], fuzzer.components['sequence'])
+
+    def test_simplify_filters(self):
+        self.assertIs(swap_if_blocks, simplify(filter_steps(choose_identity, swap_if_blocks)))
+
+        fuzzer = simplify(filter_steps(choose_last_step, filter_steps(choose_identity, duplicate_steps)))
+        self.assertEquals({'fuzz_filter': choose_last_step, 'fuzzer': duplicate_steps}, fuzzer.components)
+
+        self.assertIs(identity, simplify(filter_steps(choose_random_steps(1), in_sequence([]))))
+
+    def test_simplify_keeps_distributions(self):
+        fuzzer = choose_from([(0.5, identity), (0.5, shuffle_steps)])
+
+        self.assertIs(fuzzer, simplify(fuzzer))
+
+    def test_simplified_advice(self):
+        test_advice = {
+            ExampleWorkflow.method_for_fuzzing: in_sequence([identity, filter_steps(choose_identity, duplicate_steps)])
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice)
+
+        self.target.method_for_fuzzing()
+        self.assertEquals([1, 2, 3, 1, 2, 3], self.environment)
+
+    def test_control_structure_regions(self):
+        steps = [ast.If(), ast.Expr(), ast.For(), ast.Expr(), ast.Expr(), ast.For(), ast.Pass()]
+
+        self.assertEquals([(1, 2), (2, 5), (5, 7)], exclude_control_structures({ast.For, ast.If})(steps))
+        self.assertEquals([(0, 1), (1, 3), (3, 4), (4, 6)], include_control_structures({ast.If, ast.For})(steps))
+        self.assertEquals([(0, 7)], exclude_control_structures(set())(steps))
+
+    def test_filter_steps_with_changing_lengths(self):
+        # Regions after a region whose length changes index the steps fuzzed so far.
+        steps = [ast.Pass() for _ in range(6)]
+
+        fuzzer = filter_steps(lambda s: [(0, 1), (2, 3), (4, 5)], duplicate_steps)
+
+        with copying_on_write():
+            self.assertEquals(
+                [steps[0], steps[0], steps[1], steps[1], steps[2], steps[2], steps[3], steps[4], steps[5]],
+                fuzzer(list(steps), None))
+
+    def test_duplicate_steps_are_copied_unless_copying_on_write(self):
+        steps = ast.parse('a = 1\nb = 2').body
+
+        duplicated_steps = duplicate_steps(list(steps), None)
+
+        self.assertEqual(steps, duplicated_steps[:2])
+        self.assertEqual([ast.dump(step) for step in steps], [ast.dump(step) for step in duplicated_steps[2:]])
+        self.assertTrue(all(d is not s for d, s in zip(duplicated_steps[2:], steps)))
+
+    def test_thread_safe_fuzzing(self):
+        test_advice = {
+            ExampleWorkflow.method_for_fuzzing:
+                filter_context([(lambda context: context.environment[:1] == ['fuzzed'], replace_steps_with(2, 3))])
+        }
+        fm.fuzz_clazz(ExampleWorkflow, test_advice, thread_safe=True)
+
+        fuzzed_target = ExampleWorkflow(['fuzzed'])
+
+        def call_repeatedly(target):
+            for _ in range(0, 200):
+                target.method_for_fuzzing()
+
+        threads = [Thread(target=call_repeatedly, args=(t,)) for t in (self.target, fuzzed_target)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals([1, 2, 3] * 200, self.environment)
+        self.assertEquals(['fuzzed'] + [1, 2] * 200, fuzzed_target.environment)
+
+    def test_identity_advice_restores_original_code(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: replace_steps_with(2, 3)})
+        self.target.method_for_fuzzing()
+
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: in_sequence([identity])})
+        self.target.method_for_fuzzing()
+
+        self.assertEquals([1, 2, 1, 2, 3], self.environment)
+
+    def test_defuzz_class_restores_original_code(self):
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: replace_steps_with(2, 3)})
+        self.target.method_for_fuzzing()
+
+        fm.defuzz_class(ExampleWorkflow)
+        self.target.method_for_fuzzing()
+
+        self.assertEquals([1, 2, 1, 2, 3], self.environment)
+
+    def test_no_op_fuzzers_are_identities(self):
+        self.assertTrue(is_identity(identity))
+        self.assertTrue(is_identity(in_sequence([])))
+        self.assertTrue(is_identity(on_condition_that(False, shuffle_steps)))
+        self.assertTrue(is_identity(filter_steps(choose_last_step, in_sequence([identity, identity]))))
+        self.assertFalse(is_identity(on_condition_that(lambda: False, shuffle_steps)))
+        self.assertFalse(is_identity(in_sequence([identity, shuffle_steps])))
+
+    def test_sampled_calls_are_fuzzed(self):
+        fuzzer_calls = list()
+
+        def counting_remove_last_step(steps, context):
+            fuzzer_calls.append(context)
+            return remove_last_step(steps, context)
+
+        fm.fuzz_clazz(ExampleWorkflow, {ExampleWorkflow.method_for_fuzzing: counting_remove_last_step},
+                      sampling_rate=0.5)
+
+        with fm.random_stream(Mock(random=Mock(side_effect=[0.9, 0.1, 0.7]))):
+            for _ in range(3):
+                self.target.method_for_fuzzing()
+
+        self.assertEqual([1, 2, 3, 1, 2, 1, 2, 3], self.environment)
+        self.assertEqual(1, len(fuzzer_calls))
+
+    def test_per_method_sampling_rates(self):
+        fm.fuzz_clazz(
+            ExampleWorkflow,
+            {
+                ExampleWorkflow.method_for_fuzzing: remove_last_step,
+                ExampleWorkflow.nested_method_call: remove_last_step
+            },
+            thread_safe=True,
+            sampling_rate={ExampleWorkflow.method_for_fuzzing: 0})
+
+        self.target.method_for_fuzzing()
+        self.target.nested_method_call()
+
+        self.assertEqual([1, 2, 3, 1], self.environment)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from random import Random
+
+from pydysofu.weighted_choice import CumulativeWeights
+
+
+def linear_find(weights, cumulative_weight):
+    up_to = 0.0
+    for index, weight in enumerate(weights):
+        up_to += weight
+        if up_to >= cumulative_weight:
+            return index
+    return len(weights) - 1
+
+
+class CumulativeWeightsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.random = Random(5)
+
+    def test_find_matches_linear_search(self):
+        for size in [1, 2, 3, 7, 8, 100]:
+            weights = [self.random.randint(0, 4) for _ in range(0, size)]
+            cumulative_weights = CumulativeWeights(weights)
+            for cumulative_weight in range(0, sum(weights) + 1):
+                self.assertEqual(
+                    linear_find(weights, cumulative_weight), cumulative_weights.find(cumulative_weight))
+
+    def test_find_in_all_zero_weights_matches_linear_search(self):
+        for size in [1, 2, 3, 8]:
+            self.assertEqual(linear_find([0] * size, 0.0), CumulativeWeights([0] * size).find(0.0))
+
+    def test_find_in_empty_weights(self):
+        with self.assertRaises(ValueError):
+            CumulativeWeights([]).find(0.0)
+
+    def test_reweight(self):
+        weights = [self.random.randint(0, 4) for _ in range(0, 50)]
+        cumulative_weights = CumulativeWeights(weights)
+
+        for _ in range(0, 100):
+            index = self.random.randrange(0, 50)
+            weights[index] = self.random.randint(0, 4)
+            cumulative_weights.reweight(index, weights[index])
+
+        self.assertEqual(sum(weights), cumulative_weights.total)
+        for cumulative_weight in range(0, sum(weights) + 1):
+            self.assertEqual(linear_find(weights, cumulative_weight), cumulative_weights.find(cumulative_weight))
+
+    def test_zero_weights_are_never_chosen(self):
+        cumulative_weights = CumulativeWeights([0.0, 1.0, 0.0, 1.0, 0.0])
+
+        self.assertEqual(1, cumulative_weights.find(0.5))
+        self.assertEqual(3, cumulative_weights.find(1.5))
+        self.assertEqual(3, cumulative_weights.find(2.0))
+
+
+if __name__ == '__main__':
+    unittest.main()